@@ -0,0 +1,174 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
+
+'''Benchmarks parsing and publishing on synthetic redmine exports
+
+Generates an issues.xml of the requested size and shape, reads it with
+RedmineIssueXML and publishes it to an in-process FakeGithub. Reports
+throughput, peak memory, bytes retained per parsed issue and requests
+per issue, e.g.
+
+    python3 benchmark.py --issues 20000 --journals 5 --sparsity 3 --latency 0.02'''
+
+import io
+import os
+import sys
+import time
+import random
+import shutil
+import argparse
+import tempfile
+import tracemalloc
+from xml.sax.saxutils import escape
+from redmine_issues_to_github import RedmineIssueXML
+from fake_github import FakeGithub
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+WORDS = ['lorem', 'ipsum', 'dolor', 'sit', 'amet', 'consectetur', 'adipiscing', 'elit', 'sed', 'do']
+
+def text(length):
+    'Return about length characters of filler text'
+    words = []
+    size = 0
+    while size < length:
+        word = random.choice(WORDS)
+        words.append(word)
+        size += len(word) + 1
+    return ' '.join(words)
+
+def generateExport(path, issues=1000, descriptionLength=500, journals=0, sparsity=1, seed=1):
+    '''Write a synthetic redmine issues.xml
+
+    path: the file to write
+    issues: the number of issues
+    descriptionLength: characters per description
+    journals: journal entries per issue
+    sparsity: ids advance by a random step of 1 to sparsity, so
+              larger values leave more gaps for dummy tickets
+    seed: the random seed, equal seeds generate equal files
+    '''
+    random.seed(seed)
+    f = io.open(path, 'w', encoding='utf-8')
+    f.write('<?xml version="1.0" encoding="UTF-8"?>\n')
+    f.write('<issues total_count="%d" offset="0" limit="%d" type="array">\n' % (issues, issues))
+    id = 0
+    for i in range(issues):
+        id += random.randint(1, max(sparsity, 1))
+        parts = ['<issue>', '<id>%d</id>' % id, '<project id="1" name="Project"/>']
+        parts.append('<tracker id="%d" name="%s"/>' % (i % 3 + 1, ['Bug', 'Feature', 'Support'][i % 3]))
+        parts.append('<status id="%d" name="Status %d"/>' % (i % 6 + 1, i % 6 + 1))
+        parts.append('<priority id="%d" name="%s"/>' % (i % 4 + 1, ['Low', 'Normal', 'High', 'Urgent'][i % 4]))
+        parts.append('<author id="%d" name="User %d"/>' % (i % 7 + 1, i % 7 + 1))
+        if i % 2:
+            parts.append('<assigned_to id="%d" name="User %d"/>' % (i % 5 + 1, i % 5 + 1))
+        if i % 4 == 0:
+            parts.append('<category id="%d" name="Category %d"/>' % (i % 3 + 1, i % 3 + 1))
+        if i % 5 == 0:
+            parts.append('<fixed_version id="%d" name="Version %d"/>' % (i % 10 + 1, i % 10 + 1))
+        parts.append('<subject>%s</subject>' % escape("Issue %d: %s" % (id, text(40))))
+        parts.append('<description>%s</description>' % escape(text(descriptionLength)))
+        parts.append('<start_date>2012-01-01</start_date><due_date></due_date><done_ratio>%d</done_ratio><estimated_hours></estimated_hours>' % (i % 11 * 10))
+        parts.append('<created_on>2012-01-01T10:00:00Z</created_on><updated_on>2012-02-01T10:00:00Z</updated_on>')
+        if journals:
+            parts.append('<journals type="array">')
+            for j in range(journals):
+                parts.append('<journal id="%d"><user id="1" name="User 1"/><notes>%s</notes><created_on>2012-01-%02dT10:00:00Z</created_on><details type="array"/></journal>' % (j + 1, escape(text(100)), j % 28 + 1))
+            parts.append('</journals>')
+        parts.append('</issue>\n')
+        f.write(''.join(parts))
+    f.write('</issues>\n')
+    f.close()
+
+def peakRSS():
+    'Return the peak resident set size of this process as text'
+    if resource is None:
+        return 'n/a'
+    rss = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # Bytes on macOS, kilobytes everywhere else
+    if sys.platform == 'darwin':
+        rss /= 1024.0
+    return "%.1f MB" % (rss / 1024.0)
+
+def measureMemory(export, streaming=True, keepRedmineIssues=False):
+    '''Return the bytes retained per issue after reading export and
+    the peak bytes allocated while reading it
+    
+    Allocations are traced with tracemalloc, which slows parsing down,
+    so this runs separately from the timed parse.
+    '''
+    tracemalloc.start()
+    try:
+        before = tracemalloc.get_traced_memory()[0]
+        rix = RedmineIssueXML()
+        rix.readXML(export, closedStati=[5, 6], userMap={1: 'user1'}, streaming=streaming, keepRedmineIssues=keepRedmineIssues)
+        retained, peak = tracemalloc.get_traced_memory()
+    finally:
+        tracemalloc.stop()
+    return (retained - before) / float(len(rix.githubIssues)), peak - before
+
+def benchmark(args):
+    'Run the benchmark described by the parsed command line arguments'
+    tmpdir = tempfile.mkdtemp()
+    try:
+        export = os.path.join(tmpdir, 'issues.xml')
+        generateExport(export, args.issues, args.description, args.journals, args.sparsity, args.seed)
+        print("Generated %d issues, %.1f MB." % (args.issues, os.path.getsize(export) / 1024.0 / 1024.0))
+
+        started = time.time()
+        rix = RedmineIssueXML()
+        rix.readXML(export, closedStati=[5, 6], userMap={1: 'user1'}, streaming=not args.dom, keepRedmineIssues=False)
+        elapsed = time.time() - started
+        print("Parse:   %.2fs, %.0f issues/s, peak RSS %s" % (elapsed, args.issues / elapsed, peakRSS()))
+        if args.memory:
+            for keep in (False, True):
+                perIssue, peak = measureMemory(export, not args.dom, keep)
+                print("Memory:  %.0f bytes retained per issue, %.1f MB peak while parsing%s" % (
+                    perIssue, peak / 1024.0 / 1024.0, ', redmine issues kept' if keep else ''))
+    finally:
+        shutil.rmtree(tmpdir)
+
+    if args.no_publish:
+        return
+    github = FakeGithub(latency=args.latency, quota=args.quota, minWriteInterval=args.min_write_interval)
+    # The benchmark measures our side, keep the progress output quiet
+    stdout = sys.stdout
+    for run in range(args.runs):
+        before = github.totalRequests()
+        started = time.time()
+        sys.stdout = io.StringIO()
+        try:
+            rix.publishIssues('bench', 'repo', 'user', 'password', workers=args.workers, apiUrl=github.apiUrl, writeInterval=args.write_interval, importApi=args.import_api, graphql=args.graphql)
+        finally:
+            sys.stdout = stdout
+        elapsed = time.time() - started
+        requests = github.totalRequests() - before
+        print("Publish run %d: %.2fs, %.1f issues/s, %d requests, %.2f requests/issue, %d throttled, peak RSS %s" % (
+            run + 1, elapsed, args.issues / elapsed, requests, requests / float(args.issues), github.throttled, peakRSS()))
+    for (endpoint, count) in sorted(github.endpoints.items(), key=lambda item: -item[1]):
+        print("  %7d %s" % (count, endpoint))
+    github.stop()
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark parsing and publishing redmine issues')
+    parser.add_argument('--issues', type=int, default=1000, help='number of issues')
+    parser.add_argument('--description', type=int, default=500, help='characters per description')
+    parser.add_argument('--journals', type=int, default=0, help='journal entries per issue')
+    parser.add_argument('--sparsity', type=int, default=1, help='maximum step between two issue ids')
+    parser.add_argument('--seed', type=int, default=1, help='random seed of the generator')
+    parser.add_argument('--dom', action='store_true', help='parse with minidom instead of streaming')
+    parser.add_argument('--memory', action='store_true', help='measure the bytes retained per parsed issue with tracemalloc')
+    parser.add_argument('--no-publish', action='store_true', help='only benchmark parsing')
+    parser.add_argument('--latency', type=float, default=0.0, help='seconds of latency per request')
+    parser.add_argument('--quota', type=int, default=None, help='requests per hour of the fake API')
+    parser.add_argument('--min-write-interval', type=float, default=0.0, help='writes closer than this are throttled by the fake API')
+    parser.add_argument('--workers', type=int, default=4, help='concurrent requests')
+    parser.add_argument('--write-interval', type=float, default=0.0, help='seconds between two writes')
+    parser.add_argument('--import-api', action='store_true', help='publish through the issue import API')
+    parser.add_argument('--graphql', action='store_true', help='close and edit issues in GraphQL batches')
+    parser.add_argument('--runs', type=int, default=2, help='publish runs, later runs measure re-syncs')
+    benchmark(parser.parse_args())
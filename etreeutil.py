@@ -0,0 +1,14 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
+'Helper functions for ElementTree'
+
+def etreeGetText(element):
+    'Create text from elements, the ElementTree equivalent of domGetText'
+    rc = []
+    if element.text:
+        rc.append(element.text.strip())
+    for child in element:
+        if child.tail:
+            rc.append(child.tail.strip())
+    return ''.join(rc)
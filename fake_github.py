@@ -0,0 +1,360 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
+
+'''An in-process fake of the parts of the github API the scripts use
+
+Serves issues, comments, labels, milestones and issue imports of any
+repository from memory, as well as the GraphQL issue lookups and
+mutations, with configurable latency and rate limits, and counts every
+request. Meant for benchmarks, never for real data.'''
+
+import re
+import json
+import gzip
+import time
+import hashlib
+import threading
+import urllib.parse
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+class FakeRepository(object):
+    'The issues, comments, labels, milestones and issue imports of one repository'
+
+    def __init__(self):
+        self.issues = {}
+        self.imports = {}
+        self.comments = {}
+        self.labels = {}
+        self.milestones = {}
+
+class FakeGithubHandler(BaseHTTPRequestHandler):
+    'Answers a single request from the state of the FakeGithub server'
+
+    protocol_version = 'HTTP/1.1'
+    disable_nagle_algorithm = True
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        self.handle_request('GET')
+
+    def do_POST(self):
+        self.handle_request('POST')
+
+    def do_PATCH(self):
+        self.handle_request('PATCH')
+
+    def do_DELETE(self):
+        self.handle_request('DELETE')
+
+    def respond(self, status, data, headers=None):
+        'Send data JSON encoded, gzipped if the client accepts it, GETs revalidated by ETag'
+        body = json.dumps(data).encode('utf-8') if data is not None else b''
+        headers = dict(headers or {})
+        if self.command == 'GET' and status == 200:
+            headers['ETag'] = '"%s"' % hashlib.sha1(body).hexdigest()
+            if self.headers.get('If-None-Match') == headers['ETag']:
+                status = 304
+                body = b''
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json')
+        if body and 'gzip' in (self.headers.get('Accept-Encoding') or ''):
+            body = gzip.compress(body)
+            self.send_header('Content-Encoding', 'gzip')
+        self.send_header('Content-Length', str(len(body)))
+        for (name, value) in headers.items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def handle_request(self, method):
+        server = self.server.github
+        length = int(self.headers.get('Content-Length') or 0)
+        raw = self.rfile.read(length) if length else b''
+        if server.latency:
+            time.sleep(server.latency)
+        parts = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(parts.query)
+        path = urllib.parse.unquote(parts.path)
+        server.count(method, path)
+
+        # GraphQL queries are reads although they are POSTed
+        write = method != 'GET' and not (path == '/graphql' and not json.loads(raw.decode('utf-8'))['query'].startswith('mutation'))
+        resource = 'graphql' if path == '/graphql' else 'core'
+        throttled = server.throttle(write, resource)
+        if throttled:
+            return self.respond(throttled[0], throttled[1], throttled[2])
+        headers = server.rateLimitHeaders(resource)
+
+        if path == '/graphql' and method == 'POST':
+            data = json.loads(raw.decode('utf-8'))
+            with server.lock:
+                result = self.graphql(server, data['query'], data.get('variables') or {})
+            return self.respond(200, result, headers)
+        m = re.match(r'^/repos/([^/]+/[^/]+)/(.*)$', path)
+        if not m:
+            return self.respond(404, {'message': 'Not Found'}, headers)
+        data = json.loads(raw.decode('utf-8')) if raw else {}
+        with server.lock:
+            repo = server.repository(m.group(1))
+            status, result, extra = self.route(repo, method, m.group(2), query, data)
+        headers.update(extra)
+        self.respond(status, result, headers)
+
+    def route(self, repo, method, path, query, data):
+        'Return status, data and extra headers of a repository request'
+        if path == 'issues':
+            if method == 'POST':
+                number = len(repo.issues) + 1
+                issue = {'number': number, 'title': data['title'], 'body': data.get('body'), 'state': 'open',
+                         'labels': data.get('labels', []), 'milestone': data.get('milestone'), 'assignee': data.get('assignee'), 'comments': 0}
+                issue['node_id'] = self.server.github.nodeId(issue)
+                repo.issues[number] = issue
+                return 201, issue, {}
+            numbers = sorted(repo.issues, reverse=query.get('direction', ['asc'])[0] == 'desc')
+            return self.page(path, [repo.issues[n] for n in numbers], query)
+        m = re.match(r'^issues/(\d+)$', path)
+        if m:
+            issue = repo.issues.get(int(m.group(1)))
+            if issue is None:
+                return 404, {'message': 'Not Found'}, {}
+            if method == 'PATCH':
+                issue.update(data)
+            return 200, issue, {}
+        m = re.match(r'^issues/(\d+)/comments$', path)
+        if m:
+            number = int(m.group(1))
+            if not number in repo.issues:
+                return 404, {'message': 'Not Found'}, {}
+            if method == 'POST':
+                repo.comments.setdefault(number, []).append(data['body'])
+                repo.issues[number]['comments'] = len(repo.comments[number])
+                return 201, {'body': data['body']}, {}
+            return self.page(path, [{'body': body} for body in repo.comments.get(number, [])], query)
+        if path == 'import/issues':
+            if method == 'POST':
+                return 202, self.importIssue(repo, data), {}
+            # Imports are processed after they were seen pending once
+            since = query.get('since', [''])[0]
+            imports = [importdata for importdata in repo.imports.values() if importdata['updated_at'] >= since]
+            copies = [dict(importdata) for importdata in imports]
+            for importdata in imports:
+                importdata['status'] = 'imported'
+            imports = copies
+            return self.page(path, imports, query)
+        if path == 'labels':
+            if method == 'POST':
+                if data['name'].lower() in [name.lower() for name in repo.labels]:
+                    return 422, {'message': 'Validation Failed', 'errors': [{'resource': 'Label', 'code': 'already_exists', 'field': 'name'}]}, {}
+                label = {'name': data['name'], 'color': data.get('color', 'ededed')}
+                label['node_id'] = self.server.github.nodeId(label, 'LA')
+                repo.labels[data['name']] = label
+                return 201, label, {}
+            return self.page(path, list(repo.labels.values()), query)
+        m = re.match(r'^labels/(.+)$', path)
+        if m:
+            label = repo.labels.get(m.group(1))
+            if label is None:
+                return 404, {'message': 'Not Found'}, {}
+            if method == 'PATCH':
+                label.update(data)
+            elif method == 'DELETE':
+                del repo.labels[m.group(1)]
+                return 204, None, {}
+            return 200, label, {}
+        if path == 'milestones':
+            if method == 'POST':
+                if data['title'] in repo.milestones:
+                    return 422, {'message': 'Validation Failed', 'errors': [{'resource': 'Milestone', 'code': 'already_exists', 'field': 'title'}]}, {}
+                milestone = {'number': len(repo.milestones) + 1, 'title': data['title'], 'state': 'open'}
+                repo.milestones[data['title']] = milestone
+                return 201, milestone, {}
+            state = query.get('state', ['open'])[0]
+            milestones = [ms for ms in repo.milestones.values() if state == 'all' or ms['state'] == state]
+            return self.page(path, milestones, query)
+        return 404, {'message': 'Not Found'}, {}
+
+    def graphql(self, server, query, variables):
+        '''Answer the aliased issue and user lookups, closeIssue and
+        updateIssue mutations the scripts send, nothing else of GraphQL'''
+        if query.startswith('mutation'):
+            mutations = re.findall(r'(\w+): (closeIssue|updateIssue)\(input: \$(\w+)\)', query)
+            if server.graphqlNodeLimit and len(mutations) > server.graphqlNodeLimit:
+                return {'errors': [{'type': 'RESOURCE_LIMITS_EXCEEDED', 'message': 'Too many mutations'}]}
+            data = {}
+            errors = []
+            for (alias, name, variable) in mutations:
+                params = dict(variables[variable])
+                issue = server.nodes.get(params.pop('issueId', None) or params.pop('id', None))
+                if issue is None:
+                    data[alias] = None
+                    errors.append({'type': 'NOT_FOUND', 'path': [alias], 'message': 'Could not resolve to a node'})
+                    continue
+                if name == 'closeIssue':
+                    issue['state'] = 'closed'
+                else:
+                    if 'labelIds' in params:
+                        params['labels'] = [server.nodes[nodeId]['name'] for nodeId in params.pop('labelIds')]
+                    if 'assigneeIds' in params:
+                        assignees = [server.nodes[nodeId]['login'] for nodeId in params.pop('assigneeIds')]
+                        params['assignee'] = assignees[0] if assignees else None
+                    issue.update(params)
+                data[alias] = {'clientMutationId': None}
+            return {'data': data, 'errors': errors} if errors else {'data': data}
+        users = re.findall(r'(\w+): user\(login: \$(\w+)\)', query)
+        if users:
+            data = {'rateLimit': {'cost': 1, 'remaining': 5000}}
+            for (alias, variable) in users:
+                login = variables[variable]
+                if not login in server.users:
+                    server.users[login] = {'login': login, 'id': server.nodeId({'login': login}, 'U')}
+                data[alias] = server.users[login]
+            return {'data': data}
+        lookups = re.findall(r'(\w+): issue\(number: (\d+)\)', query)
+        if server.graphqlNodeLimit and len(lookups) > server.graphqlNodeLimit:
+            return {'errors': [{'type': 'MAX_NODE_LIMIT_EXCEEDED', 'message': 'Too many nodes'}]}
+        repo = server.repository("%s/%s" % (variables['owner'], variables['name']))
+        repository = {}
+        errors = []
+        for (alias, number) in lookups:
+            issue = repo.issues.get(int(number))
+            if issue is None:
+                repository[alias] = None
+                errors.append({'type': 'NOT_FOUND', 'path': ['repository', alias], 'message': 'Could not resolve to an Issue'})
+            else:
+                repository[alias] = {'number': issue['number'], 'id': issue['node_id'], 'title': issue['title'], 'body': issue['body'] or '', 'state': issue['state'].upper(),
+                                     'comments': {'totalCount': issue['comments']}}
+        result = {'data': {'rateLimit': {'cost': 1 + len(lookups) // 100, 'remaining': 5000}, 'repository': repository}}
+        if errors:
+            result['errors'] = errors
+        return result
+
+    def importIssue(self, repo, data):
+        'Create the issue and comments of an import, return the import status'
+        number = len(repo.issues) + 1
+        issuedata = data['issue']
+        milestone = [ms for ms in repo.milestones.values() if ms['number'] == issuedata.get('milestone')]
+        issue = {'number': number, 'title': issuedata['title'], 'body': issuedata.get('body'),
+                 'state': 'closed' if issuedata.get('closed') else 'open', 'labels': issuedata.get('labels', []),
+                 'milestone': milestone[0] if milestone else None, 'assignee': issuedata.get('assignee'),
+                 'comments': len(data.get('comments', []))}
+        issue['node_id'] = self.server.github.nodeId(issue)
+        repo.issues[number] = issue
+        repo.comments[number] = [comment['body'] for comment in data.get('comments', [])]
+        base = "http://%s/repos/%s" % (self.headers['Host'], re.match(r'^/repos/([^/]+/[^/]+)/', self.path).group(1))
+        now = time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime())
+        importdata = {'id': len(repo.imports) + 1, 'status': 'pending', 'issue_url': "%s/issues/%d" % (base, number), 'created_at': now, 'updated_at': now}
+        importdata['url'] = "%s/import/issues/%d" % (base, importdata['id'])
+        repo.imports[importdata['id']] = importdata
+        return dict(importdata)
+
+    def page(self, path, items, query):
+        'Return a page of items with a Link header to the next page'
+        perPage = int(query.get('per_page', ['30'])[0])
+        page = int(query.get('page', ['1'])[0])
+        headers = {}
+        if page * perPage < len(items):
+            params = dict((key, values[0]) for (key, values) in query.items())
+            params['page'] = page + 1
+            url = "http://%s%s?%s" % (self.headers['Host'], urllib.parse.urlsplit(self.path).path, urllib.parse.urlencode(params))
+            headers['Link'] = '<%s>; rel="next"' % url
+        return 200, items[(page - 1) * perPage:page * perPage], headers
+
+class FakeGithub(object):
+    '''A fake github API running in a background thread
+
+    Use apiUrl as the apiUrl of GithubClient. The requests are counted
+    in requests (by method) and endpoints (by method and path pattern).
+    '''
+
+    def __init__(self, latency=0.0, quota=None, minWriteInterval=0.0, retryAfter=1, graphqlNodeLimit=None):
+        '''
+        latency: seconds every request is delayed
+        quota: requests allowed per hour, None for unlimited
+        minWriteInterval: writes closer together than this are
+                          answered with a secondary rate limit 403
+        retryAfter: the Retry-After of secondary rate limit responses
+        graphqlNodeLimit: GraphQL requests with more aliases than this
+                          fail with a resource limit error
+        '''
+        self.latency = latency
+        self.quota = quota
+        self.minWriteInterval = minWriteInterval
+        self.retryAfter = retryAfter
+        self.lock = threading.Lock()
+        self.repositories = {}
+        self.requests = {}
+        self.endpoints = {}
+        self.throttled = 0
+        self.graphqlNodeLimit = graphqlNodeLimit
+        self.nodes = {}
+        self.users = {}
+        # Requests or GraphQL queries used by rate limit resource
+        self.used = {'core': 0, 'graphql': 0}
+        self.reset = int(time.time()) + 3600
+        self.lastWrite = 0.0
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeGithubHandler)
+        self.server.daemon_threads = True
+        self.server.github = self
+        self.apiUrl = 'http://127.0.0.1:%d' % self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def repository(self, name):
+        'Return the FakeRepository name, created on first use'
+        if not name in self.repositories:
+            self.repositories[name] = FakeRepository()
+        return self.repositories[name]
+
+    def nodeId(self, node, prefix='I'):
+        'Return a new GraphQL node id for an issue, label or user'
+        nodeId = '%s_%d' % (prefix, len(self.nodes) + 1)
+        self.nodes[nodeId] = node
+        return nodeId
+
+    def count(self, method, path):
+        'Count a request'
+        endpoint = "%s %s" % (method, re.sub(r'/repos/[^/]+/[^/]+', '', re.sub(r'/\d+', '/:n', path)))
+        with self.lock:
+            self.requests[method] = self.requests.get(method, 0) + 1
+            self.endpoints[endpoint] = self.endpoints.get(endpoint, 0) + 1
+
+    def totalRequests(self):
+        'Return the number of requests served'
+        return sum(self.requests.values())
+
+    def throttle(self, write, resource='core'):
+        '''Return status, data and headers of a rate limit response to a
+        read or write counting against resource or None'''
+        with self.lock:
+            now = time.time()
+            if now >= self.reset:
+                self.used = dict((name, 0) for name in self.used)
+                self.reset = int(now) + 3600
+            if self.quota is not None and self.used[resource] >= self.quota:
+                self.throttled += 1
+                headers = {'X-RateLimit-Limit': str(self.quota), 'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(self.reset), 'X-RateLimit-Resource': resource}
+                return 403, {'message': 'API rate limit exceeded'}, headers
+            self.used[resource] += 1
+            if write and self.minWriteInterval:
+                if now - self.lastWrite < self.minWriteInterval:
+                    self.throttled += 1
+                    return 403, {'message': 'You have exceeded a secondary rate limit'}, {'Retry-After': str(self.retryAfter)}
+                self.lastWrite = now
+        return None
+
+    def rateLimitHeaders(self, resource='core'):
+        'Return the rate limit headers of a response counting against resource'
+        if self.quota is None:
+            return {}
+        with self.lock:
+            return {'X-RateLimit-Limit': str(self.quota), 'X-RateLimit-Remaining': str(self.quota - self.used[resource]),
+                    'X-RateLimit-Reset': str(self.reset), 'X-RateLimit-Resource': resource}
+
+    def stop(self):
+        'Shut the server down'
+        self.server.shutdown()
+        self.server.server_close()
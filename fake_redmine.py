@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
+
+'''An in-process fake of the redmine REST API issue endpoints
+
+Serves the issues of an issues.xml export like redmine does: pages of
+issues without their journals from /issues.xml with total_count, and
+single issues including their journals from /issues/<id>.xml, every
+document with an XML declaration. Counts the requests and the most
+pages served at the same time. Meant for tests, never for real data.'''
+
+import re
+import time
+import threading
+import urllib.parse
+from xml.etree.ElementTree import parse, tostring
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+DECLARATION = b'<?xml version="1.0" encoding="UTF-8"?>\n'
+
+class FakeRedmineHandler(BaseHTTPRequestHandler):
+    'Answers a single request from the issues of the FakeRedmine server'
+
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, format, *args):
+        pass
+
+    def do_GET(self):
+        server = self.server.redmine
+        parts = urllib.parse.urlsplit(self.path)
+        query = urllib.parse.parse_qs(parts.query)
+        server.count(self.headers.get('X-Redmine-API-Key'))
+        m = re.match(r'^/issues/(\d+)\.xml$', parts.path)
+        if parts.path == '/issues.xml':
+            offset = int(query.get('offset', ['0'])[0])
+            limit = int(query.get('limit', ['25'])[0])
+            body = server.servePage(offset, limit)
+        elif m and int(m.group(1)) in server.issues:
+            body = server.serveIssue(int(m.group(1)), 'journals' in query.get('include', [''])[0])
+        else:
+            body = None
+        if body is None:
+            self.send_response(404)
+            self.send_header('Content-Length', '0')
+            self.end_headers()
+            return
+        self.send_response(200)
+        self.send_header('Content-Type', 'application/xml; charset=utf-8')
+        self.send_header('Content-Length', str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+class FakeRedmine(object):
+    '''A fake redmine server running in a background thread
+
+    Use url as the url of a RedmineSource.
+    '''
+
+    def __init__(self, export, latency=0.0):
+        '''
+        export: path of the issues.xml export to serve
+        latency: seconds every page is delayed
+        '''
+        self.latency = latency
+        self.issues = {}
+        for issue in parse(export).getroot().findall('issue'):
+            self.issues[int(issue.findtext('id'))] = issue
+        self.ids = sorted(self.issues)
+        self.lock = threading.Lock()
+        self.requests = 0
+        self.apiKeys = set()
+        self.pages = 0
+        self.maxPages = 0
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), FakeRedmineHandler)
+        self.server.daemon_threads = True
+        self.server.redmine = self
+        self.url = 'http://127.0.0.1:%d' % self.server.server_address[1]
+        self.thread = threading.Thread(target=self.server.serve_forever)
+        self.thread.daemon = True
+        self.thread.start()
+
+    def count(self, apiKey):
+        'Count a request and the API key it was sent with'
+        with self.lock:
+            self.requests += 1
+            self.apiKeys.add(apiKey)
+
+    def servePage(self, offset, limit):
+        'Return the page of issues starting at offset without their journals'
+        with self.lock:
+            self.pages += 1
+            self.maxPages = max(self.maxPages, self.pages)
+        try:
+            if self.latency:
+                time.sleep(self.latency)
+            issues = []
+            for id in self.ids[offset:offset + limit]:
+                issue = tostring(self.issues[id])
+                issues.append(re.sub(br'<journals.*</journals>', b'', issue, flags=re.S))
+            return DECLARATION + b'<issues total_count="%d" offset="%d" limit="%d" type="array">%s</issues>' % (
+                len(self.ids), offset, limit, b''.join(issues))
+        finally:
+            with self.lock:
+                self.pages -= 1
+
+    def serveIssue(self, id, journals):
+        'Return a single issue, with its journals if asked for'
+        issue = tostring(self.issues[id])
+        if not journals:
+            issue = re.sub(br'<journals.*</journals>', b'', issue, flags=re.S)
+        return DECLARATION + issue
+
+    def stop(self):
+        'Shut the server down'
+        self.server.shutdown()
+        self.server.server_close()
@@ -0,0 +1,461 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
+
+'''A small client for the github API shared by the scripts
+
+Connections are kept alive and reused from a pool, responses are
+decoded from gzip and all authorization headers are built here.
+Every request passes a RequestScheduler which keeps the client
+within github's rate limits and retries throttled requests. With a
+ResponseCache GETs are sent as conditional requests.
+
+@see http://develop.github.com/'''
+
+import io
+import gzip
+import json
+import time
+import queue
+import random
+import threading
+import http.client
+import urllib.error
+import urllib.parse
+from base64 import encodebytes as base64
+
+API_URL = 'https://api.github.com'
+
+def nextLink(link):
+    'Return the URL of the next page from a Link header or None'
+    if not link:
+        return None
+    for part in link.split(','):
+        section = part.split(';')
+        if len(section) < 2:
+            continue
+        url = section[0].strip()[1:-1]
+        for param in section[1:]:
+            if param.strip() == 'rel="next"':
+                return url
+    return None
+
+class WritePacer(object):
+    '''Spaces the writes of several processes by one interval
+
+    lock and nextWrite are a multiprocessing.Manager Lock and Value('d')
+    shared by all processes, nextWrite holds the wall clock time the
+    next write may be sent at.
+    '''
+
+    def __init__(self, lock, nextWrite, interval=1.0):
+        '''
+        lock: the lock guarding nextWrite
+        nextWrite: the shared time of the next write
+        interval: minimum seconds between two writes of all processes
+        '''
+        self.lock = lock
+        self.nextWrite = nextWrite
+        self.interval = interval
+
+    def reserve(self):
+        'Reserve the next write slot, return the seconds to wait for it'
+        with self.lock:
+            now = time.time()
+            slot = max(now, self.nextWrite.value)
+            self.nextWrite.value = slot + self.interval
+        return slot - now
+
+class RequestScheduler(object):
+    '''Paces the requests of a client along github's rate limits
+
+    The remaining quota is tracked from the X-RateLimit headers, when it
+    runs out all requests wait for the reset. Writes are spaced by
+    writeInterval to stay below the content creation limit. Throttled
+    responses (403/429 with a rate limit message) and server errors on
+    idempotent requests are retried with jittered exponential backoff,
+    honoring Retry-After. After such a pause the requests resume one
+    by one, spaced by recoverySpacing, until one succeeds again, and
+    writes are spaced further apart: every pause doubles the extra
+    spacing, every successful request shrinks it again. Several
+    processes share their write spacing through a WritePacer.
+    '''
+
+    # Requests that may be sent again after a server error
+    IDEMPOTENT = frozenset(['GET', 'HEAD', 'PUT', 'PATCH', 'DELETE'])
+
+    def __init__(self, writeInterval=1.0, maxRetries=8, backoff=1.0, maxBackoff=300.0, reserve=10, recoverySpacing=None, pacer=None):
+        '''
+        writeInterval: minimum seconds between two writes
+        maxRetries: how often a request is retried before giving up
+        backoff: the first retry delay in seconds
+        maxBackoff: the longest retry delay in seconds
+        reserve: quota left untouched when the rate limit runs low
+        recoverySpacing: seconds between two requests after a pause,
+                         defaults to the larger of writeInterval and
+                         a quarter of backoff
+        pacer: a WritePacer spacing the writes of all processes
+        '''
+        self.writeInterval = writeInterval
+        self.maxRetries = maxRetries
+        self.backoff = backoff
+        self.maxBackoff = maxBackoff
+        self.reserve = reserve
+        self.recoverySpacing = recoverySpacing if recoverySpacing is not None else max(writeInterval, backoff / 4.0)
+        self.pacer = pacer
+        self.recovering = False
+        self.nextRequest = 0.0
+        self.throttleInterval = 0.0
+        self.lock = threading.Lock()
+        # The core rate limit, other resources are kept in quotas
+        self.remaining = None
+        self.reset = None
+        self.quotas = {}
+        self.nextWrite = 0.0
+        self.pausedUntil = 0.0
+        self.started = time.monotonic()
+        self.requests = 0
+        self.writes = 0
+        self.retries = 0
+        self.waited = 0.0
+
+    def acquire(self, method, write=None, resource='core'):
+        '''Block until a request with method may be sent
+
+        write tells whether the request creates or changes content, it
+        defaults to all methods but GET and HEAD. resource names the
+        rate limit the request counts against.
+        '''
+        if write is None:
+            write = method not in ('GET', 'HEAD')
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                remaining, reset = self.quota(resource)
+                if self.pausedUntil > now:
+                    wait = self.pausedUntil - now
+                elif remaining is not None and remaining <= self.reserve and reset and reset > time.time():
+                    wait = reset - time.time() + 1
+                elif write and self.nextWrite > now:
+                    wait = self.nextWrite - now
+                elif self.recovering and self.nextRequest > now:
+                    wait = self.nextRequest - now
+                else:
+                    if self.recovering:
+                        self.nextRequest = now + self.recoverySpacing
+                    if write:
+                        self.nextWrite = now + max(self.writeInterval, self.throttleInterval)
+                        self.writes += 1
+                    if remaining is not None:
+                        self.setQuota(resource, remaining - 1, reset)
+                    self.requests += 1
+                    break
+                self.waited += wait
+            time.sleep(wait)
+        if write and self.pacer:
+            wait = self.pacer.reserve()
+            with self.lock:
+                self.waited += wait
+            time.sleep(wait)
+
+    def update(self, headers, resource='core'):
+        '''Track the quota from the rate limit headers of a response
+
+        The headers describe the rate limit named by X-RateLimit-Resource
+        or resource if it is missing, GraphQL has a point quota of its
+        own that must not be mistaken for the core one.
+        '''
+        resource = headers.get('X-RateLimit-Resource') or resource
+        remaining = headers.get('X-RateLimit-Remaining')
+        reset = headers.get('X-RateLimit-Reset')
+        with self.lock:
+            oldRemaining, oldReset = self.quota(resource)
+            self.setQuota(resource, int(remaining) if remaining is not None else oldRemaining, int(reset) if reset is not None else oldReset)
+
+    def quota(self, resource):
+        'Return the remaining requests and reset time of a rate limit, None if unknown'
+        if resource == 'core':
+            return self.remaining, self.reset
+        return self.quotas.get(resource, (None, None))
+
+    def setQuota(self, resource, remaining, reset):
+        'Set the remaining requests and reset time of a rate limit'
+        if resource == 'core':
+            self.remaining, self.reset = remaining, reset
+        else:
+            self.quotas[resource] = (remaining, reset)
+
+    def retryDelay(self, method, attempt, status, headers, body):
+        '''Return the seconds to wait before retrying a failed request
+        or None if it must not be retried'''
+        if attempt >= self.maxRetries:
+            return None
+        if status in (403, 429):
+            if headers.get('X-RateLimit-Remaining') == '0' and headers.get('X-RateLimit-Reset'):
+                return max(int(headers['X-RateLimit-Reset']) - time.time(), 0) + 1 + random.uniform(0, self.backoff)
+            if status == 403 and not (b'rate limit' in body.lower() or b'abuse' in body.lower()):
+                return None
+        elif status < 500 or method not in self.IDEMPOTENT:
+            return None
+        if headers.get('Retry-After'):
+            # Jitter keeps the retries of several clients apart
+            return float(headers['Retry-After']) + random.uniform(0, self.backoff)
+        delay = min(self.backoff * 2 ** attempt, self.maxBackoff)
+        return random.uniform(delay / 2, delay)
+
+    def pause(self, delay):
+        'Hold back all requests for delay seconds'
+        with self.lock:
+            self.pausedUntil = max(self.pausedUntil, time.monotonic() + delay)
+            # Requests throttled together count as one pause
+            if not self.recovering:
+                self.throttleInterval = min(max(self.throttleInterval * 2, self.recoverySpacing), self.maxBackoff)
+            self.recovering = True
+            self.retries += 1
+
+    def succeeded(self):
+        'A request succeeded, stop spacing the requests after a pause'
+        if self.recovering or self.throttleInterval:
+            with self.lock:
+                self.recovering = False
+                self.throttleInterval *= 0.9
+                if self.throttleInterval < 0.001:
+                    self.throttleInterval = 0.0
+
+    def stats(self):
+        'Return the throughput numbers as a dict'
+        with self.lock:
+            elapsed = time.monotonic() - self.started
+            return {
+                'elapsed': elapsed,
+                'requests': self.requests,
+                'writes': self.writes,
+                'retries': self.retries,
+                'waited': self.waited,
+                'requestsPerSecond': self.requests / elapsed if elapsed else 0.0,
+                'writesPerSecond': self.writes / elapsed if elapsed else 0.0,
+                'remaining': self.remaining,
+            }
+
+    def summary(self):
+        'Return the throughput numbers as a line of text'
+        return "%(requests)d requests (%(writes)d writes, %(retries)d retries) in %(elapsed).1fs, %(requestsPerSecond).2f requests/s, %(waited).1fs throttled, %(remaining)s remaining" % self.stats()
+
+class GithubResponse(object):
+    'A response from the github API'
+    def __init__(self, url, status, headers, data):
+        self.url = url
+        self.status = status
+        self.headers = headers
+        self.data = data
+
+    def json(self):
+        'Return the decoded JSON body'
+        if not self.data:
+            return None
+        return json.loads(self.data.decode('utf-8'))
+
+class GithubClient(object):
+    '''Talks to the github API over a pool of keep-alive connections
+
+    The client is thread safe, every thread takes a connection from
+    the pool for the duration of a request.
+    '''
+
+    def __init__(self, user, repo, authUser, authPassword, apiUrl=API_URL, poolSize=8, timeout=60, scheduler=None, limiter=None, telemetry=None, cache=None):
+        '''
+        user: the github username for the repository
+        repo: the github repository
+        authUser: your github username
+        authPassword: your github password
+        apiUrl: the github API to talk to
+        poolSize: the number of idle connections kept open
+        timeout: socket timeout in seconds
+        scheduler: the RequestScheduler pacing the requests
+        limiter: a semaphore held while a request is in flight, shared
+                 by several clients (or processes) it caps their
+                 combined concurrency
+        telemetry: a Telemetry every finished request is reported to
+        cache: a ResponseCache to revalidate GET responses against
+        '''
+        parts = urllib.parse.urlsplit(apiUrl)
+        self.scheme = parts.scheme
+        self.host = parts.netloc
+        self.apiPath = parts.path.rstrip('/')
+        self.basepath = "%s/repos/%s/%s/" % (self.apiPath, user, repo)
+        self.timeout = timeout
+        self.pool = queue.LifoQueue(poolSize)
+        self.scheduler = scheduler or RequestScheduler()
+        self.limiter = limiter
+        self.telemetry = telemetry
+        self.cache = cache
+        authData = base64(bytes(('%s:%s' % (authUser, authPassword)), 'utf-8')).decode().replace('\n', '')
+        self.headers = {
+            'Authorization': 'Basic %s' % authData,
+            'Accept': 'application/vnd.github.v3+json',
+            'Accept-Encoding': 'gzip',
+            'User-Agent': 'redmine-issues-to-github',
+        }
+
+    def connect(self):
+        'Open a new connection to the API host'
+        if self.scheme == 'http':
+            return http.client.HTTPConnection(self.host, timeout=self.timeout)
+        return http.client.HTTPSConnection(self.host, timeout=self.timeout)
+
+    def acquire(self):
+        'Take an idle connection from the pool or open a new one'
+        try:
+            return self.pool.get_nowait(), True
+        except queue.Empty:
+            return self.connect(), False
+
+    def release(self, conn):
+        'Put a connection back into the pool'
+        try:
+            self.pool.put_nowait(conn)
+        except queue.Full:
+            conn.close()
+
+    def url(self, path):
+        '''Return the request path for path
+
+        Absolute URLs (as found in Link headers) and paths starting with /
+        are used as they are, everything else is relative to the repository.
+        '''
+        if '://' in path:
+            parts = urllib.parse.urlsplit(path)
+            return parts.path + ('?' + parts.query if parts.query else '')
+        if path.startswith('/'):
+            return self.apiPath + path
+        return self.basepath + path
+
+    def request(self, method, path, data=None, headers=None, write=None):
+        '''Send a request and return a GithubResponse
+
+        data is sent JSON encoded. write=False paces a POST that only
+        reads, like a GraphQL query, as a read. Error responses raise
+        urllib.error.HTTPError just like urlopen does.
+        '''
+        url = self.url(path)
+        resource = 'graphql' if url.split('?', 1)[0].endswith('/graphql') else 'core'
+        body = None
+        reqHeaders = dict(self.headers)
+        if data is not None:
+            body = json.dumps(data).encode('utf-8')
+            reqHeaders['Content-Type'] = 'application/json'
+        if headers:
+            reqHeaders.update(headers)
+        cached = None
+        if self.cache and method == 'GET':
+            cacheKey = "%s %s" % (url, reqHeaders['Accept'])
+            cached = self.cache.get(cacheKey)
+            if cached:
+                reqHeaders['If-None-Match'] = cached[0]
+
+        attempt = 0
+        latency = 0.0
+        while True:
+            self.scheduler.acquire(method, write, resource)
+            started = time.monotonic()
+            try:
+                if self.limiter:
+                    with self.limiter:
+                        res, raw = self.send(method, url, body, reqHeaders)
+                else:
+                    res, raw = self.send(method, url, body, reqHeaders)
+            except Exception as e:
+                if self.telemetry:
+                    self.telemetry.record(method, url, 0, latency + time.monotonic() - started, 0, attempt)
+                raise e
+            latency += time.monotonic() - started
+            self.scheduler.update(res.msg, resource)
+            if res.status < 400:
+                self.scheduler.succeeded()
+                break
+            delay = self.scheduler.retryDelay(method, attempt, res.status, res.msg, raw)
+            if delay is None:
+                break
+            print("%s %s returned %d, retrying in %.1fs" % (method, url, res.status, delay))
+            self.scheduler.pause(delay)
+            attempt += 1
+
+        if self.telemetry:
+            self.telemetry.record(method, url, res.status, latency, len(raw) + len(body or b''), attempt)
+        fullurl = "%s://%s%s" % (self.scheme, self.host, url)
+        if res.status >= 400:
+            raise urllib.error.HTTPError(fullurl, res.status, res.reason, res.msg, io.BytesIO(raw))
+        if self.cache and method == 'GET':
+            self.cache.hit(res.status == 304 and cached is not None)
+            if res.status == 304 and cached:
+                return GithubResponse(fullurl, 200, cached[1], cached[2])
+            if res.getheader('ETag'):
+                self.cache.put(cacheKey, res.getheader('ETag'), {'Link': res.getheader('Link')}, raw)
+        return GithubResponse(fullurl, res.status, res.msg, raw)
+
+    def send(self, method, url, body, headers):
+        'Send a request over a pooled connection, return the response and its decoded body'
+        while True:
+            conn, reused = self.acquire()
+            try:
+                conn.request(method, url, body, headers)
+                res = conn.getresponse()
+                raw = res.read()
+            except (http.client.RemoteDisconnected, ConnectionResetError, BrokenPipeError) as e:
+                conn.close()
+                # The server closed an idle keep-alive connection, try again
+                # on a fresh one
+                if reused:
+                    continue
+                raise e
+            except Exception as e:
+                conn.close()
+                raise e
+            break
+
+        if res.will_close:
+            conn.close()
+        else:
+            self.release(conn)
+
+        if res.getheader('Content-Encoding') == 'gzip':
+            raw = gzip.decompress(raw)
+        return res, raw
+
+    def get(self, path):
+        'GET path and return the decoded JSON'
+        return self.request('GET', path).json()
+
+    def getPaginated(self, path, perPage=100, headers=None):
+        '''Yield the items of a paginated listing
+
+        The pages are followed through the Link header until the last
+        one was read.
+        '''
+        sep = '&' if '?' in path else '?'
+        path = "%s%sper_page=%d" % (path, sep, perPage)
+        while path:
+            res = self.request('GET', path, headers=headers)
+            for item in res.json():
+                yield item
+            path = nextLink(res.headers.get('Link'))
+
+    def post(self, path, data):
+        'POST data to path and return the decoded JSON'
+        return self.request('POST', path, data).json()
+
+    def patch(self, path, data):
+        'PATCH path with data and return the decoded JSON'
+        return self.request('PATCH', path, data).json()
+
+    def delete(self, path):
+        'DELETE path'
+        self.request('DELETE', path)
+
+    def close(self):
+        'Close all idle connections'
+        while True:
+            try:
+                self.pool.get_nowait().close()
+            except queue.Empty:
+                break
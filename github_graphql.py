@@ -0,0 +1,195 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
+
+'''Batched issue lookups and state changes through the github GraphQL API
+
+Many issues are looked up or changed in a single request by giving
+every issue its own alias in one query or mutation. The batch size
+follows the cost github reports for queries and the time requests
+take, oversized batches that time out are split.
+
+@see https://docs.github.com/en/graphql'''
+
+import re
+import time
+import json
+import urllib.error
+
+class BatchSize(object):
+    'The number of items per GraphQL request, tuned from cost and latency'
+
+    def __init__(self, size=100, minimum=1, maximum=100, maxCost=10, targetSeconds=5.0):
+        '''
+        size: the first batch size
+        minimum: the smallest batch size
+        maximum: the largest batch size, github allows 100 nodes per connection
+        maxCost: the highest rate limit cost a single query may have
+        targetSeconds: the longest a single request should take
+        '''
+        self.size = size
+        self.minimum = minimum
+        self.maximum = maximum
+        self.maxCost = maxCost
+        self.targetSeconds = targetSeconds
+
+    def update(self, count, cost, seconds):
+        '''Adjust the size after a batch of count items cost cost points
+        (None for mutations) and took seconds'''
+        factor = 2.0
+        if cost:
+            factor = min(factor, self.maxCost / float(cost))
+        if seconds:
+            factor = min(factor, self.targetSeconds / seconds)
+        if factor < 1:
+            self.size = max(self.minimum, int(count * factor))
+        elif count >= self.size:
+            self.size = min(self.maximum, int(count * factor))
+
+    def shrink(self):
+        '''Halve the size after a batch failed for its size, return
+        whether it did shrink. The size never grows back beyond it.'''
+        if self.size <= self.minimum:
+            return False
+        self.size = max(self.minimum, self.size // 2)
+        self.maximum = self.size
+        return True
+
+class GraphqlClient(object):
+    '''Sends batched GraphQL requests for the issues of one repository
+
+    Requests go through a GithubClient and share its connections,
+    scheduler and telemetry.
+    '''
+
+    def __init__(self, client, user, repo, batchSize=None):
+        '''
+        client: the GithubClient to send the requests with
+        user: the github username for the repository
+        repo: the github repository
+        batchSize: the BatchSize to tune
+        '''
+        self.client = client
+        self.user = user
+        self.repo = repo
+        self.batchSize = batchSize or BatchSize()
+        # github.com serves GraphQL at /graphql, Enterprise at /api/graphql
+        path = re.sub(r'/v3$', '', client.apiPath)
+        self.url = "%s://%s%s/graphql" % (client.scheme, client.host, path)
+
+    def execute(self, query, variables=None):
+        '''Send a query or mutation, return its data and errors
+
+        Only mutations are spaced like writes, queries are paced as reads
+        although they are POSTed.
+        '''
+        write = query.startswith('mutation')
+        res = self.client.request('POST', self.url, {'query': query, 'variables': variables or {}}, write=write).json()
+        return res.get('data') or {}, res.get('errors') or []
+
+    def batches(self, items, send):
+        '''Call send with the items in batches of the current batch size
+
+        send is called with a batch and the index of its first item and
+        returns the query cost or None. Batches failing with a timeout
+        or resource limit are retried at half the size.
+        '''
+        offset = 0
+        while offset < len(items):
+            batch = items[offset:offset + self.batchSize.size]
+            started = time.monotonic()
+            try:
+                cost = send(batch, offset)
+            except urllib.error.HTTPError as e:
+                if e.code in (502, 504) and self.batchSize.shrink():
+                    continue
+                raise e
+            except ResourceLimitError as e:
+                if self.batchSize.shrink():
+                    continue
+                raise RuntimeError(str(e))
+            self.batchSize.update(len(batch), cost, time.monotonic() - started)
+            offset += len(batch)
+
+    def fetchIssues(self, numbers):
+        '''Return the issues with the given numbers as a dict by number
+
+        Issues that do not exist are missing from the dict. Issues hold
+        number, id (the node id), title, body, state in lower case and
+        the number of comments.
+        '''
+        issues = {}
+        def send(batch, offset):
+            fields = ["i%d: issue(number: %d) { number id title body state comments { totalCount } }" % (number, number) for number in batch]
+            query = "query($owner: String!, $name: String!) { rateLimit { cost remaining } repository(owner: $owner, name: $name) { %s } }" % ' '.join(fields)
+            data, errors = self.execute(query, {'owner': self.user, 'name': self.repo})
+            checkErrors(errors, ignore=('NOT_FOUND',))
+            for issuedata in (data.get('repository') or {}).values():
+                if issuedata:
+                    issuedata['state'] = issuedata['state'].lower()
+                    issuedata['comments'] = issuedata['comments']['totalCount']
+                    issues[issuedata['number']] = issuedata
+            return (data.get('rateLimit') or {}).get('cost')
+        self.batches(list(numbers), send)
+        return issues
+
+    def fetchUserIds(self, logins):
+        '''Return the node ids of the users with the given logins as a
+        dict by login, unknown users are missing from the dict'''
+        users = {}
+        def send(batch, offset):
+            params = ', '.join("$u%d: String!" % (offset + i) for i in range(len(batch)))
+            fields = ' '.join("u%d: user(login: $u%d) { login id }" % (offset + i, offset + i) for i in range(len(batch)))
+            variables = dict(("u%d" % (offset + i), login) for (i, login) in enumerate(batch))
+            data, errors = self.execute("query(%s) { rateLimit { cost remaining } %s }" % (params, fields), variables)
+            checkErrors(errors, ignore=('NOT_FOUND',))
+            for (alias, userdata) in data.items():
+                if alias != 'rateLimit' and userdata:
+                    users[batch[int(alias[1:]) - offset]] = userdata['id']
+            return (data.get('rateLimit') or {}).get('cost')
+        self.batches(list(logins), send)
+        return users
+
+    def mutate(self, name, inputType, inputs, done=None):
+        '''Run the mutation name once for every input in batches
+
+        done is called with the index of every input that succeeded,
+        failures raise once the batch is finished.
+        '''
+        def send(batch, offset):
+            params = ', '.join("$m%d: %s!" % (offset + i, inputType) for i in range(len(batch)))
+            fields = ' '.join("m%d: %s(input: $m%d) { clientMutationId }" % (offset + i, name, offset + i) for i in range(len(batch)))
+            variables = dict(("m%d" % (offset + i), data) for (i, data) in enumerate(batch))
+            data, errors = self.execute("mutation(%s) { %s }" % (params, fields), variables)
+            for alias in data:
+                if data[alias] is not None and done:
+                    done(int(alias[1:]))
+            checkErrors(errors)
+            return None
+        self.batches(list(inputs), send)
+
+    def closeIssues(self, nodeIds, done=None):
+        'Close the issues with the given node ids, done is called with every closed node id'
+        self.mutate('closeIssue', 'CloseIssueInput', [{'issueId': nodeId} for nodeId in nodeIds],
+            lambda i: done(nodeIds[i]) if done else None)
+        print("Closed %d issues" % len(nodeIds))
+
+    def updateIssues(self, updates, done=None):
+        '''Update issues, every update is an UpdateIssueInput dict with
+        the node id as id and labelIds and assigneeIds as node ids too,
+        done is called with every updated node id'''
+        self.mutate('updateIssue', 'UpdateIssueInput', updates,
+            lambda i: done(updates[i]['id']) if done else None)
+        print("Edited %d issues" % len(updates))
+
+class ResourceLimitError(Exception):
+    'A GraphQL request was too large for github to answer'
+
+def checkErrors(errors, ignore=()):
+    'Raise for GraphQL errors, except those with a type in ignore'
+    errors = [error for error in errors if error.get('type') not in ignore]
+    if not errors:
+        return
+    if [error for error in errors if error.get('type') in ('MAX_NODE_LIMIT_EXCEEDED', 'RESOURCE_LIMITS_EXCEEDED')]:
+        raise ResourceLimitError(json.dumps(errors))
+    raise RuntimeError("GraphQL request failed: %s" % json.dumps(errors))
@@ -0,0 +1,116 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
+
+'''A persistent cache of github API responses for conditional requests
+
+GithubClient stores every GET response carrying an ETag here and
+sends the ETag as If-None-Match next time. github answers unchanged
+resources with 304 Not Modified, which does not count against the
+rate limit, and the body is served from the cache. The cache is a
+SQLite file, the least recently used responses are evicted once it
+grows beyond maxBytes. Reads and writes are committed in batches,
+the cache only speeds up later runs and losing its latest changes
+in a crash costs a few requests.'''
+
+import json
+import time
+import sqlite3
+import threading
+
+class ResponseCache(object):
+    'ETags, headers and bodies of GET responses by URL'
+
+    # Changes collected before they are committed
+    commitInterval = 100
+    # Share of maxBytes the cache is evicted down to once it is full
+    lowWater = 0.9
+
+    def __init__(self, path, maxBytes=100 * 1024 * 1024):
+        '''
+        path: the SQLite file, created if missing
+        maxBytes: the body size that makes the cache evict responses
+        '''
+        self.maxBytes = maxBytes
+        self.touched = {}
+        self.changes = 0
+        self.lock = threading.Lock()
+        self.db = sqlite3.connect(path, check_same_thread=False)
+        self.db.execute('''CREATE TABLE IF NOT EXISTS responses (
+            key TEXT PRIMARY KEY,
+            etag TEXT NOT NULL,
+            headers TEXT NOT NULL,
+            body BLOB NOT NULL,
+            size INTEGER NOT NULL,
+            used REAL NOT NULL)''')
+        self.db.execute('CREATE INDEX IF NOT EXISTS responses_used ON responses (used)')
+        self.size = self.db.execute('SELECT COALESCE(SUM(size), 0) FROM responses').fetchone()[0]
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, key):
+        'Return the ETag, headers and body cached for key or None'
+        with self.lock:
+            row = self.db.execute('SELECT etag, headers, body FROM responses WHERE key = ?', (key,)).fetchone()
+            if row is None:
+                return None
+            # The time of use is written with the next commit
+            self.touched[key] = time.time()
+            self.changed()
+        return row[0], json.loads(row[1]), bytes(row[2])
+
+    def put(self, key, etag, headers, body):
+        'Cache a response, evicting the least recently used ones if the cache is full'
+        with self.lock:
+            old = self.db.execute('SELECT size FROM responses WHERE key = ?', (key,)).fetchone()
+            if old:
+                self.size -= old[0]
+            self.db.execute('INSERT OR REPLACE INTO responses VALUES (?, ?, ?, ?, ?, ?)',
+                (key, etag, json.dumps(headers), sqlite3.Binary(body), len(body), time.time()))
+            self.size += len(body)
+            self.touched.pop(key, None)
+            if self.size > self.maxBytes:
+                self.evict()
+            self.changed()
+
+    def changed(self):
+        'Count a change, commit once commitInterval changes were made'
+        self.changes += 1
+        if self.changes >= self.commitInterval:
+            self.commit()
+
+    def commit(self):
+        'Write the collected times of use and commit'
+        self.db.executemany('UPDATE responses SET used = ? WHERE key = ?', [(used, key) for (key, used) in self.touched.items()])
+        self.touched = {}
+        self.db.commit()
+        self.changes = 0
+
+    def evict(self):
+        '''Delete the least recently used responses until the cache is
+        down to lowWater of maxBytes, so that it is not full again with
+        the next response'''
+        self.db.executemany('UPDATE responses SET used = ? WHERE key = ?', [(used, key) for (key, used) in self.touched.items()])
+        self.touched = {}
+        target = self.maxBytes * self.lowWater
+        evicted = []
+        for (key, size) in self.db.execute('SELECT key, size FROM responses ORDER BY used'):
+            if self.size <= target:
+                break
+            evicted.append((key,))
+            self.size -= size
+        self.db.executemany('DELETE FROM responses WHERE key = ?', evicted)
+
+    def hit(self, hit):
+        'Count a revalidated (hit) or changed (miss) response'
+        with self.lock:
+            if hit:
+                self.hits += 1
+            else:
+                self.misses += 1
+
+    def close(self):
+        'Commit and close the cache file'
+        with self.lock:
+            self.commit()
+            self.db.close()
@@ -48,27 +48,40 @@
 import io
 import sys
 import os
-import urllib.request
+import urllib.error
 import urllib.parse
-import json
-from base64 import encodebytes as base64
+from concurrent.futures import ThreadPoolExecutor
+from github_client import GithubClient, RequestScheduler, API_URL
+from telemetry import Telemetry
+from http_cache import ResponseCache
 
 class LabelManager(object):
     
-    def __init__(self, user, repo, authUser, authPassword):       
-        self.baseurl = "https://api.github.com/repos/%s/%s/" % (user, repo)
-        self.authData = base64(bytes(('%s:%s' % (authUser, authPassword)), 'utf-8')).decode().replace('\n', '')
+    def __init__(self, user, repo, authUser, authPassword, apiUrl=API_URL, telemetry=None, workers=4, writeInterval=1.0, cache=None):
+        '''
+        telemetry: path of a JSON lines file every request is logged to
+        workers: the number of concurrent requests
+        writeInterval: minimum seconds between two writes
+        cache: path of the SQLite file caching GET responses
+        '''
+        self.telemetry = Telemetry(telemetry)
+        self.workers = workers
+        scheduler = RequestScheduler(writeInterval=writeInterval)
+        self.cache = ResponseCache(cache) if cache else None
+        self.client = GithubClient(user, repo, authUser, authPassword, apiUrl=apiUrl, poolSize=workers, scheduler=scheduler, telemetry=self.telemetry, cache=self.cache)
         self.fetchLabels()
         
     def fetchLabels(self):
-        'Fetch label data'
+        '''Fetch label data
+        
+        All pages are read, the labels are indexed by their lower cased
+        name since github treats label names case insensitive.
+        '''
         self.labels = []
-        labelsUrl = self.baseurl + "labels"
-        req = urllib.request.Request(labelsUrl)
-        req.add_header('Authorization', 'Basic %s' % self.authData)
-        res = urllib.request.urlopen(req)
-        for label in json.loads(res.read().decode('utf-8')):
+        self.index = {}
+        for label in self.client.getPaginated("labels"):
             self.labels.append(label)
+            self.index[label['name'].lower()] = label
             
     def saveLabels(self, outfile):
         'Save label and their colors to outfile'
@@ -77,8 +90,9 @@ class LabelManager(object):
             f.write("%s: %s\n" % (label['name'], label['color']))
         f.close()
         
-    def updateLabels(self, infile):
-        'Update the label colors from infile'
+    def readLabels(self, infile):
+        'Return the names and colors listed in infile as a list of pairs'
+        labels = []
         f = io.open(infile, 'r')
         for line in f.readlines():
             line = line.strip()
@@ -86,28 +100,78 @@ class LabelManager(object):
                 if line[0] == "#":
                     continue
                 name, color = line.split(":")
-                name = name.strip()
-                color = color.strip().lower()
-                labeldata = {
-                    'name': name,
-                    'color': color
-                }
-                print(labeldata)
-                data = json.dumps(labeldata)
-                clen = len(data)
-                data = data.encode('utf-8')
-                labelUrl = self.baseurl + "labels/" + name
-                req = urllib.request.Request(labelUrl)
-                req.add_header('Content-Type', 'application/json')
-                req.add_header('Content-Length', str(clen))
-                req.add_header('Authorization', 'Basic %s' % self.authData)
-                try:
-                    res = urllib.request.urlopen(req, data)
-                except urllib.error.HTTPError as e:
-                    print(e.msg)
-                    print(e.fp.read().decode('utf-8'))
-                    raise e
+                labels.append((name.strip(), color.strip().lower()))
         f.close()
+        return labels
+        
+    def diffLabels(self, wanted, delete=False):
+        '''Return the changes that turn the labels into wanted
+        
+        Changes are tuples of the action ('create', 'update' or
+        'delete'), the current name and the label data. Labels that
+        already have the wanted name and color are left alone.
+        
+        wanted: a list of name and color pairs
+        delete: also delete the labels missing from wanted
+        '''
+        changes = []
+        names = set()
+        for (name, color) in wanted:
+            names.add(name.lower())
+            labeldata = {
+                'name': name,
+                'color': color
+            }
+            label = self.index.get(name.lower())
+            if label is None:
+                changes.append(('create', name, labeldata))
+            elif label['name'] != name or label['color'].lower() != color:
+                changes.append(('update', label['name'], labeldata))
+        if delete:
+            for label in self.labels:
+                if not label['name'].lower() in names:
+                    changes.append(('delete', label['name'], None))
+        return changes
+        
+    def applyChange(self, change):
+        'Send a single change to github'
+        action, name, labeldata = change
+        print("%s %s" % (action, labeldata or name))
+        try:
+            if action == 'create':
+                self.client.post("labels", labeldata)
+            elif action == 'update':
+                self.client.patch("labels/" + urllib.parse.quote(name), labeldata)
+            else:
+                self.client.delete("labels/" + urllib.parse.quote(name))
+        except urllib.error.HTTPError as e:
+            print(e.msg)
+            print(e.fp.read().decode('utf-8'))
+            raise e
+        
+    def updateLabels(self, infile, delete=False):
+        '''Update the label colors from infile
+        
+        Only labels whose color differs are changed, missing labels are
+        created and with delete labels not listed in infile are deleted.
+        The changes are sent concurrently.
+        '''
+        changes = self.diffLabels(self.readLabels(infile), delete)
+        print("%d label changes." % len(changes))
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        try:
+            list(executor.map(self.applyChange, changes))
+        finally:
+            executor.shutdown()
+        if changes:
+            self.fetchLabels()
+        print(self.telemetry.summary())
+
+    def close(self):
+        'Close the connections and commit the response cache'
+        self.client.close()
+        if self.cache:
+            self.cache.close()
 
 if __name__ == '__main__':
     user = 'github-user'
@@ -120,3 +184,4 @@ if __name__ == '__main__':
     # lm.saveLabels("labels.txt")
     # Read new colors from modified file
     # lm.updateLabels("new-labels.txt")
+    lm.close()
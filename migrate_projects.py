@@ -0,0 +1,137 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
+
+'''Migrates many redmine projects to their github repositories at once
+
+The projects are listed in a JSON manifest:
+
+    {
+        "authUser": "your-github-username",
+        "authPassword": "your-github-password",
+        "apiConcurrency": 8,
+        "writeInterval": 1.0,
+        "projects": [
+            {
+                "name": "website",
+                "source": "website-issues.xml",
+                "user": "github-user",
+                "repo": "website",
+                "closedStati": [3, 5, 6],
+                "userMap": {"1": "github-user"}
+            },
+            {
+                "name": "backend",
+                "source": {"url": "http://redmine", "project": "backend", "apiKey": "..."},
+                "user": "github-user",
+                "repo": "backend",
+                "closedStati": [3, 5, 6],
+                "userMap": {},
+                "options": {"journal": "backend.jsonl"}
+            }
+        ]
+    }
+
+A source is either the path of an issues.xml export or the arguments
+of a RedmineSource. options are passed on to publishIssues. Every
+project is parsed and published in a process of its own, all
+processes together send at most apiConcurrency requests at a time and
+space their writes by writeInterval seconds.'''
+
+import io
+import sys
+import json
+import time
+import argparse
+from multiprocessing import Manager
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from redmine_issues_to_github import RedmineIssueXML
+from redmine_source import RedmineSource
+from github_client import WritePacer
+
+def migrateProject(project, authUser, authPassword, limiter, pacer):
+    'Parse and publish a single project, return its report'
+    report = {
+        'name': project['name'],
+        'repo': "%s/%s" % (project['user'], project['repo']),
+        'status': 'failed',
+    }
+    started = time.time()
+    try:
+        userMap = dict((int(id), name) for (id, name) in project.get('userMap', {}).items())
+        rix = RedmineIssueXML()
+        source = project['source']
+        if isinstance(source, dict):
+            rix.readRedmine(
+                RedmineSource(source['url'], source['project'], apiKey=source.get('apiKey'), user=source.get('user'), password=source.get('password'), journals=source.get('journals', False)),
+                closedStati=project.get('closedStati', []),
+                userMap=userMap,
+                keepRedmineIssues=False,
+            )
+        else:
+            rix.readXML(source, closedStati=project.get('closedStati', []), userMap=userMap, streaming=True, keepRedmineIssues=False)
+        report['issues'] = len(rix.githubIssues)
+        report['parseSeconds'] = time.time() - started
+        published = time.time()
+        rix.publishIssues(project['user'], project['repo'], project.get('authUser', authUser), project.get('authPassword', authPassword), limiter=limiter, pacer=pacer, **project.get('options', {}))
+        report['publishSeconds'] = time.time() - published
+        report['requests'] = rix.stats['requests']
+        report['retries'] = rix.stats['retries']
+        report['status'] = 'done'
+    except Exception as e:
+        report['error'] = "%s: %s" % (type(e).__name__, e)
+    report['seconds'] = time.time() - started
+    return report
+
+def migrateProjects(manifest, processes=4, reportFile=None):
+    '''Migrate all projects of manifest, return the reports
+
+    manifest: the parsed manifest
+    processes: the number of projects migrated at the same time
+    reportFile: path to write the reports to as JSON
+    '''
+    projects = manifest['projects']
+    manager = Manager()
+    limiter = manager.BoundedSemaphore(manifest.get('apiConcurrency', 8))
+    # The content creation limit counts the writes of all processes
+    pacer = WritePacer(manager.Lock(), manager.Value('d', 0.0), manifest.get('writeInterval', 1.0))
+    reports = []
+    started = time.time()
+    executor = ProcessPoolExecutor(max_workers=processes)
+    try:
+        futures = {}
+        for project in projects:
+            futures[executor.submit(migrateProject, project, manifest.get('authUser'), manifest.get('authPassword'), limiter, pacer)] = project
+        for future in as_completed(futures):
+            report = future.result()
+            reports.append(report)
+            print("[%d/%d] %s (%s): %s in %.1fs" % (len(reports), len(projects), report['name'], report['repo'], report['status'], report['seconds']))
+    finally:
+        executor.shutdown()
+        manager.shutdown()
+
+    print("Migrated %d of %d projects in %.1fs." % (len([r for r in reports if r['status'] == 'done']), len(projects), time.time() - started))
+    for report in reports:
+        if report['status'] == 'done':
+            print("%-20s %6d issues, parsed in %6.1fs, published in %7.1fs, %6d requests" % (report['name'], report['issues'], report['parseSeconds'], report['publishSeconds'], report['requests']))
+        else:
+            print("%-20s %s" % (report['name'], report.get('error')))
+    if reportFile:
+        f = io.open(reportFile, 'w', encoding='utf-8')
+        json.dump(reports, f, indent=1)
+        f.close()
+    return reports
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Migrate many redmine projects to github')
+    parser.add_argument('manifest', help='the JSON manifest of the projects')
+    parser.add_argument('--processes', type=int, default=4, help='projects migrated at the same time')
+    parser.add_argument('--report', help='write the per-project reports to this JSON file')
+    args = parser.parse_args()
+
+    f = io.open(args.manifest, 'r', encoding='utf-8')
+    manifest = json.load(f)
+    f.close()
+    reports = migrateProjects(manifest, args.processes, args.report)
+    if [r for r in reports if r['status'] != 'done']:
+        sys.exit(1)
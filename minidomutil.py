@@ -4,9 +4,18 @@
 'Helper functions for minidom'
 
 def domGetText(node):
-    'Create text from elements'
+    '''Create text from elements
+
+    Text and CDATA sections up to the next child element are one run of
+    text, like the text and tails of ElementTree, every run is stripped.
+    '''
     rc = []
+    run = []
     for node in node.childNodes:
-        if node.nodeType == node.TEXT_NODE:
-            rc.append(node.data.strip())
+        if node.nodeType in (node.TEXT_NODE, node.CDATA_SECTION_NODE):
+            run.append(node.data)
+        elif node.nodeType == node.ELEMENT_NODE:
+            rc.append(''.join(run).strip())
+            run = []
+    rc.append(''.join(run).strip())
     return ''.join(rc)
\ No newline at end of file
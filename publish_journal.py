@@ -0,0 +1,77 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
+
+'''An append-only journal of the steps a publishing run completed
+
+Every completed step (dummy created, issue created, closed, comment
+added, milestone or label created) is written as one JSON line and
+flushed right away. A resumed run reads the journal back and skips
+the recorded steps without asking github.'''
+
+import io
+import os
+import json
+import threading
+
+class PublishJournal(object):
+    'Records completed publishing steps in a JSON lines file'
+
+    def __init__(self, path=None):
+        '''
+        path: the journal file, it is created if missing and appended to
+              otherwise. Without a path the journal is only kept in memory.
+        '''
+        self.path = path
+        self.lock = threading.Lock()
+        self.steps = {}
+        self.lastIssue = 0
+        self.file = None
+        if path is None:
+            return
+        if os.path.exists(path):
+            self.load()
+        self.file = io.open(path, 'a', encoding='utf-8')
+
+    def load(self):
+        'Read the steps recorded by previous runs'
+        f = io.open(self.path, 'r', encoding='utf-8')
+        for line in f:
+            try:
+                entry = json.loads(line)
+            except ValueError:
+                # The last line is cut off if the run was killed while writing
+                continue
+            self.remember(entry)
+        f.close()
+        print("Resuming from journal %s, last issue %d." % (self.path, self.lastIssue))
+
+    def remember(self, entry):
+        'Add a journal entry to the in-memory index'
+        self.steps[(entry['step'], str(entry['key']))] = entry
+        if entry['step'] in ('issue', 'dummy'):
+            self.lastIssue = max(self.lastIssue, int(entry['key']))
+
+    def has(self, step, key):
+        'Return whether step was completed for key'
+        return (step, str(key)) in self.steps
+
+    def get(self, step, key):
+        'Return the entry recorded for step and key or None'
+        return self.steps.get((step, str(key)))
+
+    def record(self, step, key, **data):
+        'Record that step was completed for key'
+        entry = {'step': step, 'key': key}
+        entry.update(data)
+        with self.lock:
+            self.remember(entry)
+            if self.file:
+                self.file.write(json.dumps(entry) + "\n")
+                self.file.flush()
+
+    def close(self):
+        'Close the journal file'
+        if self.file:
+            self.file.close()
+            self.file = None
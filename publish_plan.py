@@ -0,0 +1,75 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
+
+'''The operation plan of a publishing run
+
+A plan is the ordered list of operations (label, milestone, dummy,
+create, close, reopen, comment, comments, edit, import, importDummy) a
+run sends to github. It can be written to a file by a dry run,
+inspected, and executed later. The request count and an estimated wall
+time are stored with it.'''
+
+import io
+import json
+import time
+
+# Github allows this many requests per hour for an authenticated user
+HOURLY_LIMIT = 5000
+
+def countRequests(operations):
+    'Return the number of requests the operations take'
+    count = 0
+    for op in operations:
+        if op['op'] == 'comments':
+            count += len(op['comments']) - op.get('start', 0)
+        else:
+            count += 1
+    return count
+
+def quotaSeconds(requests, hourlyLimit=HOURLY_LIMIT, remaining=None, reset=None):
+    '''Return the seconds the rate limit holds requests back
+
+    With the remaining quota and its reset time (as reported by github)
+    the requests beyond the remaining quota wait for the reset and then
+    run at hourlyLimit. Without them the whole hourly quota is assumed.
+    '''
+    if remaining is None or reset is None:
+        return requests * 3600.0 / hourlyLimit
+    if requests <= remaining:
+        return 0.0
+    return max(reset - time.time(), 0) + (requests - remaining) * 3600.0 / hourlyLimit
+
+def estimateSeconds(operations, workers=1, writeInterval=1.0, latency=0.3, hourlyLimit=HOURLY_LIMIT, remaining=None, reset=None):
+    '''Estimate the wall time of the operations in seconds
+
+    All operations are writes, so the run takes at least as long as
+    the write spacing, the rate limit, the issue creations (which run
+    one after another) and the requests spread over the workers.
+    remaining and reset describe the current rate limit if known.
+    '''
+    requests = countRequests(operations)
+    creates = len([op for op in operations if op['op'] in ('create', 'dummy', 'import', 'importDummy')])
+    return max(
+        requests * writeInterval,
+        quotaSeconds(requests, hourlyLimit, remaining, reset),
+        creates * latency,
+        requests * latency / workers,
+    )
+
+def savePlan(path, operations, workers=1, writeInterval=1.0, remaining=None, reset=None):
+    'Write the operations with their request count and estimate to path'
+    f = io.open(path, 'w', encoding='utf-8')
+    json.dump({
+        'requests': countRequests(operations),
+        'estimatedSeconds': estimateSeconds(operations, workers, writeInterval, remaining=remaining, reset=reset),
+        'operations': operations,
+    }, f, indent=1)
+    f.close()
+
+def loadPlan(path):
+    'Return the operations of the plan file path'
+    f = io.open(path, 'r', encoding='utf-8')
+    plan = json.load(f)
+    f.close()
+    return plan['operations']
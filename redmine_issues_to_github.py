@@ -48,70 +48,312 @@ them to a github repository.
 @author Markus Tacker <m@coderbyheart.de>'''
 
 import io
+import os
 import sys
 from xml.dom.minidom import parse, parseString
+from xml.etree.ElementTree import iterparse
 from minidomutil import domGetText
-import urllib.request
-import urllib.parse
+from etreeutil import etreeGetText
 import json
-from base64 import encodebytes as base64
+import time
+import hashlib
+from datetime import datetime
+from string import Formatter
+import urllib.error
+import urllib.parse
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor, wait
+from github_client import GithubClient, RequestScheduler, API_URL
+from publish_journal import PublishJournal
+from sync_state import SyncState
+from github_graphql import GraphqlClient
+from http_cache import ResponseCache
+from telemetry import Telemetry
+from publish_plan import countRequests, estimateSeconds, savePlan, loadPlan
+
+# The fields listed below the description in a github issue body
+BODY_FIELDS = [('author', 'Reporter'), ('assigned_to', 'Assigned to'), ('start_date', 'Begin'), ('due_date', 'End'), ('done_ratio', 'Completed')]
+
+# Github rejects comment bodies longer than this
+COMMENT_LIMIT = 65536
+
+# The media type of github's issue import API
+IMPORT_ACCEPT = 'application/vnd.github.golden-comet-preview+json'
+
+# Direct children of an <issue> element referencing another redmine object
+REFERENCE_FIELDS = frozenset(['project', 'tracker', 'status', 'priority', 'author', 'assigned_to', 'category', 'fixed_version', 'parent'])
+# Direct children of an <issue> element holding plain text
+TEXT_FIELDS = frozenset(['id', 'subject', 'description', 'start_date', 'due_date', 'done_ratio', 'estimated_hours', 'created_on', 'updated_on'])
 
 class RedmineIssue(object):
     'Represents a redmine issue'
+    __slots__ = tuple(REFERENCE_FIELDS) + tuple(TEXT_FIELDS) + ('journals', 'attachments')
+    
     def __repr__(self):
         return "redmine issue #%s: %s" % (self.id, self.subject)
 
 class GithubIssue(object):
     'Represents a github issue'
+    __slots__ = ('id', 'created_on', 'updated_on', 'title', 'body', 'bodyHash', 'state', 'labels', 'milestone', 'assignee', 'comments')
+    
     def __init__(self):
         self.state = 'open'
         self.labels = []
         self.milestone = None
         self.assignee = None
+        self.comments = []
         
     def __repr__(self):
         return "github issue #%s: %s" % (self.id, self.title)
     
     def close(self):
         self.state = 'closed'
+        
+    def contentHash(self):
+        'Return a hash over everything that is published of the issue'
+        content = [self.title, self.bodyHash, self.state, self.labels, self.milestone, self.assignee, self.comments]
+        return hashlib.sha1(json.dumps(content).encode('utf-8')).hexdigest()
+
+def parseTimestamp(value):
+    'Parse a redmine timestamp, returns None for unknown formats'
+    try:
+        return datetime.strptime(value, '%Y-%m-%dT%H:%M:%SZ')
+    except ValueError:
+        return None
+
+def bodyHash(body):
+    'Return a fixed size hash of an issue body, None counts as empty'
+    return hashlib.sha1((body or '').encode('utf-8')).hexdigest()
+
+def alreadyExists(e, body):
+    'Return whether a failed create was rejected because the resource exists'
+    return e.code == 422 and 'already_exists' in body
+
+class BodyRenderer(object):
+    '''Renders the github issue body of a redmine issue
+    
+    The body is the header followed by one line for every field that
+    is set. Both templates use str.format syntax: the header may use
+    any text field of the issue, the line template {label} and
+    {value}. Templates are compiled once, rendering only looks up
+    the fields used and joins the parts.
+    '''
+    
+    def __init__(self, header='{description}\n', line='__{label}:__ {value}\n', fields=BODY_FIELDS):
+        '''
+        header: the template of the start of the body
+        line: the template of a field line
+        fields: a list of (field, label) tuples, in order
+        '''
+        self.header = header
+        self.headerFields = [name for (text, name, spec, conversion) in Formatter().parse(header) if name]
+        self.lines = []
+        for (key, label) in fields:
+            label = label.replace('{', '{{').replace('}', '}}')
+            self.lines.append((key, key in REFERENCE_FIELDS, line.format(label=label, value='{value}')))
+    
+    def render(self, redmineIssue):
+        'Return the body for redmineIssue'
+        values = {}
+        for name in self.headerFields:
+            values[name] = getattr(redmineIssue, name)
+        parts = [self.header.format_map(values)]
+        for (key, reference, template) in self.lines:
+            v = getattr(redmineIssue, key)
+            if v:
+                parts.append(template.format(value=v['name'] if reference else v))
+        return ''.join(parts)
 
 class RedmineIssueXML(object):
     'Represents the list of redmine redmineIssues in XML format'
     
-    def __init__(self):
-        pass
+    # Journal notes closer together than this many seconds are merged
+    # into one comment
+    commentGap = 600
+    # Seconds between two status checks of pending issue imports
+    importPollInterval = 1.0
+    # Pending imports are checked after this many submissions
+    importBatch = 100
+    
+    def __init__(self, renderer=None, privateNotes=False):
+        '''
+        renderer: the BodyRenderer for the issue bodies
+        privateNotes: also migrate journal notes marked private in
+                      redmine, they end up in public github comments
+        '''
+        self.renderer = renderer or BodyRenderer()
+        self.privateNotes = privateNotes
         
-    def readXML(self, xmlfile, closedStati=None, userMap=None):
+    def readXML(self, xmlfile, closedStati=None, userMap=None, streaming=False, keepRedmineIssues=True):
         '''Read the issues from the xml file
         closedStati: a list of redmine status ids whose tickets are closed
         userMap: a map of redmine user ids to github usernames 
+        streaming: parse the file issue by issue instead of building
+                   a DOM of the whole export, keeps memory flat
+        keepRedmineIssues: keep the redmine issues in redmineIssues
+                           after they were converted
         '''
-        self.dom = parse(xmlfile)
+        self.initIssues(closedStati, userMap, keepRedmineIssues)
+        if streaming:
+            for issue in self.iterXML(xmlfile):
+                self.addRedmineIssue(issue)
+        else:
+            dom = parse(xmlfile)
+            # Only the issues directly below the root, <children> of an
+            # issue hold nested <issue> elements too
+            for issue in dom.documentElement.childNodes:
+                if issue.nodeType == issue.ELEMENT_NODE and issue.tagName == 'issue':
+                    self.addIssue(issue)
+            dom.unlink()
+            
+        print("Processing %d redmine issues." % len(self.githubIssues))
+        
+    def readRedmine(self, source, closedStati=None, userMap=None, keepRedmineIssues=True):
+        '''Read the issues from a redmine server
+        
+        Every page is converted while the following pages are still
+        being downloaded, publishing starts once all pages were read.
+        
+        source: a RedmineSource
+        closedStati: a list of redmine status ids whose tickets are closed
+        userMap: a map of redmine user ids to github usernames 
+        keepRedmineIssues: keep the redmine issues in redmineIssues
+                           after they were converted
+        '''
+        self.initIssues(closedStati, userMap, keepRedmineIssues)
+        for page in source.iterPages():
+            for issue in self.iterXML(io.BytesIO(page)):
+                self.addRedmineIssue(issue)
+        
+        print("Processing %d redmine issues." % len(self.githubIssues))
+        
+    def initIssues(self, closedStati, userMap, keepRedmineIssues):
+        'Start a new, empty list of issues'
         self.redmineIssues = []
         self.githubIssues = []
+        self.references = {}
         self.closedStati = closedStati
         self.userMap = userMap
-        for issue in self.dom.getElementsByTagName('issue'):
-            self.addIssue(issue)
-            
-        print("Processing %d redmine issues." % len(self.redmineIssues))
+        self.keepRedmineIssues = keepRedmineIssues
+        
+    def iterXML(self, xmlfile):
+        '''Yield the issues from the xml file one at a time
+        
+        Only the <issue> elements directly below the root are read,
+        every element is discarded as soon as its issue was created.
+        '''
+        root = None
+        depth = 0
+        for event, el in iterparse(xmlfile, events=('start', 'end')):
+            if event == 'start':
+                if root is None:
+                    root = el
+                depth += 1
+                continue
+            depth -= 1
+            if depth == 1 and el.tag == 'issue':
+                issue = self.elementToIssue(el)
+                root.clear()
+                yield issue
         
     def addIssue(self, issueNode):
-        'Creates an issue from the given node'
-        issue = RedmineIssue()
+        '''Creates an issue from the given node
+        
+        Only the direct children of the node are read, so nested
+        elements (journals, children, custom fields) are never
+        searched and cannot shadow the issue's own fields.
+        '''
+        issue = self.newRedmineIssue()
+        
+        for el in issueNode.childNodes:
+            if el.nodeType != el.ELEMENT_NODE:
+                continue
+            key = el.tagName
+            if key in REFERENCE_FIELDS:
+                setattr(issue, key, self.reference(int(el.getAttribute('id')), el.getAttribute('name')))
+            elif key in TEXT_FIELDS:
+                setattr(issue, key, domGetText(el))
+            elif key == 'journals':
+                for journal in el.getElementsByTagName('journal'):
+                    users = journal.getElementsByTagName('user')
+                    notes = journal.getElementsByTagName('notes')
+                    created = journal.getElementsByTagName('created_on')
+                    private = journal.getElementsByTagName('private_notes')
+                    if private and domGetText(private[0]) == 'true' and not self.privateNotes:
+                        continue
+                    if notes and domGetText(notes[0]):
+                        issue.journals.append({
+                            'user': users[0].getAttribute('name') if users else '',
+                            'notes': domGetText(notes[0]),
+                            'created_on': domGetText(created[0]) if created else '',
+                        })
+            elif key == 'attachments':
+                for attachment in el.getElementsByTagName('attachment'):
+                    data = {}
+                    for field in ['filename', 'content_url', 'description']:
+                        nodes = attachment.getElementsByTagName(field)
+                        data[field] = domGetText(nodes[0]) if nodes else ''
+                    issue.attachments.append(data)
+            
+        self.addRedmineIssue(issue)
         
-        for key in ['project', 'tracker', 'status', 'priority', 'author', 'assigned_to', 'category', 'fixed_version', 'parent']:
-            nodes = issueNode.getElementsByTagName(key)
-            v = None
-            if len(nodes):
-                el = nodes[0]
-                v = {'id': int(el.getAttribute('id')), 'name': el.getAttribute('name')}
-            setattr(issue, key, v)
+    def elementToIssue(self, issueElement):
+        'Creates an issue from the direct children of the given ElementTree element'
+        issue = self.newRedmineIssue()
         
-        for key in ['id', 'subject', 'description', 'start_date', 'due_date', 'done_ratio', 'estimated_hours', 'created_on', 'updated_on']:
-            setattr(issue, key, domGetText(issueNode.getElementsByTagName(key)[0]))
+        for el in issueElement:
+            key = el.tag
+            if key in REFERENCE_FIELDS:
+                setattr(issue, key, self.reference(int(el.get('id')), el.get('name', '')))
+            elif key in TEXT_FIELDS:
+                setattr(issue, key, etreeGetText(el))
+            elif key == 'journals':
+                for journal in el.iter('journal'):
+                    user = journal.find('user')
+                    notes = (journal.findtext('notes') or '').strip()
+                    if (journal.findtext('private_notes') or '').strip() == 'true' and not self.privateNotes:
+                        continue
+                    if notes:
+                        issue.journals.append({
+                            'user': user.get('name', '') if user is not None else '',
+                            'notes': notes,
+                            'created_on': (journal.findtext('created_on') or '').strip(),
+                        })
+            elif key == 'attachments':
+                for attachment in el.iter('attachment'):
+                    data = {}
+                    for field in ['filename', 'content_url', 'description']:
+                        data[field] = (attachment.findtext(field) or '').strip()
+                    issue.attachments.append(data)
             
-        self.redmineIssues.append(issue)
+        return issue
+        
+    def reference(self, id, name):
+        '''Return the {'id', 'name'} dict of a referenced redmine object
+        
+        Equal references share one dict, they must not be modified.
+        '''
+        key = (id, name)
+        ref = self.references.get(key)
+        if ref is None:
+            ref = self.references[key] = {'id': id, 'name': name}
+        return ref
+        
+    def newRedmineIssue(self):
+        'Creates an empty redmine issue, missing fields stay None or empty'
+        issue = RedmineIssue()
+        for key in REFERENCE_FIELDS:
+            setattr(issue, key, None)
+        for key in TEXT_FIELDS:
+            setattr(issue, key, '')
+        issue.journals = []
+        issue.attachments = []
+        return issue
+        
+    def addRedmineIssue(self, issue):
+        'Adds a parsed redmine issue and its github counterpart'
+        if self.keepRedmineIssues:
+            self.redmineIssues.append(issue)
         self.githubIssues.append(self.toGithubIssue(issue))
         
     def toGithubIssue(self, redmineIssue):
@@ -122,19 +364,11 @@ class RedmineIssueXML(object):
             issue.close() 
             
         issue.id = redmineIssue.id
+        issue.created_on = redmineIssue.created_on
+        issue.updated_on = redmineIssue.updated_on
         issue.title = redmineIssue.subject
-        issue.body = redmineIssue.description
-        issue.body += "\n"
-        
-        for (key, label) in [('author', 'Reporter'), ('assigned_to', 'Assigned to')]:
-            v = getattr(redmineIssue, key)
-            if v:
-                issue.body += "__%s:__ %s\n" % (label, v['name'])
-        
-        for (key, label) in [('start_date', 'Begin'), ('due_date', 'End'), ('done_ratio', 'Completed')]:
-            v = getattr(redmineIssue, key)
-            if v:
-                issue.body += "__%s:__ %s\n" % (label, v)
+        issue.body = self.renderer.render(redmineIssue)
+        issue.bodyHash = bodyHash(issue.body)
                 
         assigned_to = getattr(redmineIssue, 'assigned_to')
         if assigned_to:
@@ -148,87 +382,815 @@ class RedmineIssueXML(object):
             issue.labels.append(redmineIssue.category['name'])
         if redmineIssue.fixed_version:
             issue.milestone = redmineIssue.fixed_version['name']
+        
+        issue.comments = self.toGithubComments(redmineIssue)
             
         return issue
+        
+    def toGithubComments(self, redmineIssue):
+        '''Convert the journal notes and attachments of a redmine issue
+        to github comment bodies
+        
+        Notes written less than commentGap seconds after the previous
+        one are merged into one comment as long as it stays below
+        github's size limit. Attachments are linked in a comment of
+        their own.
+        '''
+        comments = []
+        if redmineIssue.attachments:
+            lines = ["__Attachments:__"]
+            for attachment in redmineIssue.attachments:
+                line = "* [%s](%s)" % (attachment['filename'], attachment['content_url'])
+                if attachment['description']:
+                    line += " %s" % attachment['description']
+                lines.append(line)
+            comments.append("\n".join(lines))
+        
+        parts = []
+        size = 0
+        last = None
+        for journal in redmineIssue.journals:
+            note = "__%s__ wrote on %s:\n\n%s" % (journal['user'], journal['created_on'], journal['notes'])
+            created = parseTimestamp(journal['created_on'])
+            merge = parts and created and last and (created - last).total_seconds() <= self.commentGap
+            if parts and (not merge or size + len(note) + 2 > COMMENT_LIMIT):
+                comments.append("\n\n".join(parts))
+                parts = []
+                size = 0
+            while len(note) > COMMENT_LIMIT:
+                comments.append(note[:COMMENT_LIMIT])
+                note = note[COMMENT_LIMIT:]
+            parts.append(note)
+            size += len(note) + 2
+            last = created
+        if parts:
+            comments.append("\n\n".join(parts))
+        return comments
             
-    def publishIssues(self, user, repo, authUser, authPassword):
+    def publishIssues(self, user, repo, authUser, authPassword, workers=1, apiUrl=API_URL, writeInterval=1.0, journal=None, syncState=None, preserveNumbers=True, numberMap=None, snapshot=None, dryRun=None, plan=None, limiter=None, telemetry=None, importApi=False, graphql=False, cache=None, pacer=None):
         '''Publish the issues to github
         
         In order to keep the redmine ticket ids we create dummy tickets
-        and close the immediately.
+        and close the immediately. The dummy tickets are planned upfront
+        and the number of requests they take is printed. Without
+        preserveNumbers no dummy tickets are created, instead the
+        github number of every redmine issue is written to numberMap.
+        
+        Existing issues are loaded once from the paginated issue list,
+        or probed one by one when that takes fewer requests. Numbers
+        beyond the newest issue on github are not looked up at all.
+        Issues are created one after another in id order because github
+        numbers them in the order they are created. Everything else
+        (closing, comments, edits, labels and milestones) runs on a
+        pool of worker threads.
+        
+        With a journal file every completed step is recorded, running
+        again with the same journal resumes an interrupted run and
+        skips the recorded steps without any requests.
+        
+        With a sync state file only the issues updated in redmine or
+        changed since the last sync are published. State changes are
+        applied both ways and the comments added since are posted.
+        Only issues whose operations all succeeded are recorded as
+        synced.
+        
+        Publishing is planned first: the operations are computed from
+        the state of the repository and then executed. A dry run writes
+        the plan with its request count and estimated wall time to a
+        file instead, a later run can execute that file. Dry runs
+        planned from a snapshot file of the repository need no requests
+        at all. A real run refreshes the snapshot first, as the
+        repository may have changed since it was taken.
+        
+        With importApi every issue is sent with its state, timestamps
+        and comments in a single request to github's issue import API
+        (dummy tickets too). Imports are processed asynchronously by
+        github, their status is polled in batches.
+        
+        With graphql issue lookups, closes and edits are sent in batches
+        through the GraphQL API, many issues per request.
+        
+        With a cache file every GET is sent as a conditional request,
+        unchanged responses are served from the cache without using up
+        the rate limit.
+        
+        Every request is measured (endpoint, status, latency, bytes and
+        retries), progress is printed with issues per second and an ETA
+        and a summary per endpoint is printed at the end.
         
         user: the github username for the repository
         repo: the github repository
         authUser: your github username
         authPassword: your github password
+        workers: the number of concurrent requests
+        apiUrl: the github API to talk to
+        writeInterval: minimum seconds between two writes, github
+                       asks for at least one second
+        journal: path of the journal file to resume from and record to
+        syncState: path of the state file for incremental syncs
+        preserveNumbers: create dummy tickets so that github issues get
+                         their redmine id as number
+        numberMap: path of the JSON file mapping redmine ids to github
+                   numbers when numbers are not preserved
+        snapshot: path of a snapshot of the repository state to plan
+                  against, it is taken from github if the file is missing
+                  or the run is not a dry run
+        dryRun: path to write the plan to instead of executing it
+        plan: path of a plan file to execute
+        limiter: a semaphore capping the concurrent requests across
+                 several runs
+        telemetry: path of a JSON lines file every request is logged to
+        importApi: create issues through the issue import API
+        graphql: look up, close and edit issues in GraphQL batches
+        cache: path of the SQLite file caching GET responses
+        pacer: a WritePacer spacing the writes across several runs
         '''
         
-        self.baseurl = "https://api.github.com/repos/%s/%s/" % (user, repo)
-        self.authData = base64(bytes(('%s:%s' % (authUser, authPassword)), 'utf-8')).decode().replace('\n', '')
-       
-        # Load milestone data
-        # Milestones are created on demand
+        scheduler = RequestScheduler(writeInterval=writeInterval, pacer=pacer)
+        self.telemetry = Telemetry(telemetry)
+        self.cache = ResponseCache(cache) if cache else None
+        self.client = GithubClient(user, repo, authUser, authPassword, apiUrl=apiUrl, poolSize=workers + 1, scheduler=scheduler, limiter=limiter, telemetry=self.telemetry, cache=self.cache)
+        self.graphql = GraphqlClient(self.client, user, repo) if graphql else None
+        self.nodeIds = {}
+        self.labelIds = {}
+        self.userIds = {}
+        self.mutations = {'close': [], 'edit': []}
+        self.executor = ThreadPoolExecutor(max_workers=workers)
+        self.pending = deque()
+        self.window = workers * 4
+        self.issueIndex = {}
         self.milestones = {}
-        milestonesUrl = self.baseurl + "milestones"
-        for state in ['open', 'closed']:
-            req = urllib.request.Request(milestonesUrl + '?state=' + state)
-            req.add_header('Authorization', 'Basic %s' % self.authData)
-            res = urllib.request.urlopen(req)
-            for milestonedata in json.loads(res.read().decode('utf-8')):
-                self.milestones[milestonedata['title']] = milestonedata
-            
-        # Create label data
-        # Labes are created upfront
-        labels = []
-        for ilabels in map(lambda p: p.labels, self.githubIssues):
-            for label in ilabels:
-                if not label in labels:
-                    labels.append(label)
-        for label in labels:
-            self.createLabel(label)
-        self.createLabel("Dummy-Ticket")
-        
-        currentIssue = 1
-        
-        for issue in sorted(self.githubIssues, key=lambda p: int(p.id)):
-            
-            # Too keep the old redmine id's we have to create dummy
-            # tickets
-            while currentIssue < int(issue.id):
-                if self.getIssue(currentIssue) == None:
-                    self.createIssue("Dummy ticket %d" % currentIssue, labels=["Dummy-Ticket"])
-                    self.closeIssue(currentIssue)
-                currentIssue += 1
-                
-            # Check if milestone exists
-            milestone = None
-            if issue.milestone:
-                if not issue.milestone in self.milestones:
-                    self.createMilestone(issue.milestone)
-                milestone = self.milestones[issue.milestone]['number']
-                
-            # Check if issue exists
-            githubissuedata = self.getIssue(issue.id)
-            if githubissuedata:
-                print("Issue %d already exists." % int(issue.id))
-                if githubissuedata['body'] != issue.body:
-                    self.createComment(issue.id, issue.title + "\n\n" + issue.body)
-                if githubissuedata['title'] != issue.title:
-                    self.editIssue(issue.id, issue.title, body=issue.body, milestone=milestone, labels=issue.labels, assignee=issue.assignee)
+        self.journal = PublishJournal(journal)
+        self.syncState = SyncState(syncState) if syncState else None
+        self.preserveNumbers = preserveNumbers
+        self.importApi = importApi
+        self.imports = {}
+        self.numberMapFile = numberMap
+        self.loadNumberMap()
+        try:
+            if plan:
+                operations = loadPlan(plan)
+                self.fetchMilestones()
+                self.checkPlan(operations)
             else:
-                self.createIssue(issue.title, body=issue.body, milestone=milestone, labels=issue.labels, assignee=issue.assignee)
-                # Close tickets
-                if issue.state == 'closed':
-                    self.closeIssue(issue.id)
+                if snapshot:
+                    self.loadSnapshot(snapshot, refresh=not dryRun)
+                operations = self.planPublish(snapshot is not None)
+            # The rate limit as reported by the listings, unknown when
+            # planning from a snapshot
+            estimate = estimateSeconds(operations, workers, writeInterval, remaining=scheduler.remaining, reset=scheduler.reset)
+            print("Planned %d requests, estimated %.0fs." % (countRequests(operations), estimate))
+            if dryRun:
+                savePlan(dryRun, operations, workers, writeInterval, scheduler.remaining, scheduler.reset)
+                return
+            try:
+                self.executePlan(operations)
+            finally:
+                if self.syncState and not plan:
+                    self.saveSyncState(operations)
+                if self.numberMapFile:
+                    self.saveNumberMap()
+        finally:
+            self.executor.shutdown()
+            self.client.close()
+            self.journal.close()
+            self.telemetry.close()
+            self.stats = scheduler.stats()
+            print(scheduler.summary())
+            if self.cache:
+                print("Cache: %d unchanged, %d changed responses." % (self.cache.hits, self.cache.misses))
+                self.cache.close()
+            print(self.telemetry.summary())
+        
+    def planPublish(self, fromSnapshot=False):
+        '''Return the operations that publish the issues
+        
+        fromSnapshot: the repository state was loaded from a snapshot,
+                      otherwise it is fetched from github
+        '''
+        issues = {}
+        for issue in self.githubIssues:
+            issues[int(issue.id)] = issue
+        self.planned = []
+        if not issues:
+            return []
+        
+        numbers = range(1, max(issues) + 1)
+        if self.syncState:
+            # Numbers up to the last synced one were all handled before,
+            # only changed issues among them are published again
+            changed = [number for number, issue in issues.items() if number <= self.syncState.maxId and self.syncState.changed(issue)]
+            numbers = sorted(changed) + list(range(self.syncState.maxId + 1, max(issues) + 1))
+            print("%d issues changed since the last sync." % len(changed))
+        if not self.preserveNumbers:
+            numbers = [number for number in numbers if number in issues]
+        self.planned = [issues[number] for number in numbers if number in issues]
+        
+        if not fromSnapshot:
+            self.fetchMilestones()
+            self.existingLabels = self.fetchLabels()
+            if self.preserveNumbers:
+                lookup = numbers
+            else:
+                lookup = [self.numberMap[number] for number in numbers if number in self.numberMap]
+            # Numbers beyond the newest issue cannot exist yet, the rest
+            # is probed unless listing all issues takes fewer requests
+            latest = self.latestNumber()
+            lookup = [number for number in lookup if number <= latest]
+            probes = (len(lookup) + 99) // 100 if self.graphql else len(lookup)
+            if probes > (latest + 99) // 100:
+                self.fetchIssueIndex()
+            else:
+                self.fetchIssues(lookup)
+        
+        operations = []
+        
+        # Labels and milestones are created upfront
+        # github treats label names case insensitive, the first spelling wins
+        labels = {}
+        for issue in self.planned:
+            for label in issue.labels:
+                labels.setdefault(label.lower(), label)
+        if self.preserveNumbers and len(self.planned) < len(numbers):
+            labels.setdefault("dummy-ticket", "Dummy-Ticket")
+        for label in labels.values():
+            if not label.lower() in self.existingLabels and not self.journal.has('label', label):
+                operations.append({'op': 'label', 'name': label})
+        
+        milestones = {}
+        for issue in self.planned:
+            if issue.milestone and not issue.milestone in self.milestones and not self.journal.has('milestone', issue.milestone):
+                milestones[issue.milestone] = True
+        for title in milestones:
+            operations.append({'op': 'milestone', 'title': title})
+        
+        gaps = {}
+        if self.preserveNumbers:
+            gaps = self.planGaps(numbers, issues)
+        
+        for number in numbers:
+            issue = issues.get(number)
+            if issue is None:
+                # Too keep the old redmine id's we have to create dummy
+                # tickets for every number without an issue
+                if gaps.get(number) == 'create' and self.importApi:
+                    operations.append({'op': 'importDummy', 'number': number})
+                    continue
+                if gaps.get(number) == 'create':
+                    operations.append({'op': 'dummy', 'number': number})
+                if gaps.get(number):
+                    operations.append({'op': 'close', 'id': number, 'number': number})
+            else:
+                operations.extend(self.planIssue(number, issue))
+        return operations
+        
+    def planGaps(self, numbers, issues):
+        '''Return the dummy ticket work for the numbers without an issue
+        
+        Maps numbers to 'create' (create and close a dummy ticket) or
+        'close' (a dummy ticket created by an interrupted run is still
+        open). The plan and its request count are printed.
+        '''
+        gaps = {}
+        for number in numbers:
+            if number in issues:
+                continue
+            githubissuedata = self.issueIndex.get(number)
+            if self.journal.has('dummy', number):
+                if not self.journal.has('close', number):
+                    gaps[number] = 'close'
+            elif self.journal.has('import', "dummy/%d" % number):
+                # Imported by an interrupted run, its status is polled
+                continue
+            elif githubissuedata is None:
+                gaps[number] = 'create'
+            elif githubissuedata['state'] == 'open' and githubissuedata['title'] == "Dummy ticket %d" % number:
+                gaps[number] = 'close'
+        creates = len([action for action in gaps.values() if action == 'create'])
+        requests = creates * (1 if self.importApi else 2) + len(gaps) - creates
+        print("Dummy tickets: %d to create, %d to close, %d requests." % (creates, len(gaps) - creates, requests))
+        return gaps
+    
+    def planIssue(self, id, issue):
+        '''Return the operations that create or update a single issue
+        
+        id: the redmine id of the issue, journal entries are keyed by it
+        issue: the GithubIssue
+        '''
+        operations = []
+        number = self.numberMap.get(id)
+        if self.preserveNumbers:
+            number = id
+        
+        entry = self.journal.get('issue', id)
+        if entry:
+            number = entry.get('number', number)
+            if issue.state == 'closed' and not self.journal.has('close', id):
+                operations.append({'op': 'close', 'id': id, 'number': number})
+            if issue.comments:
+                operations.append({'op': 'comments', 'id': id, 'number': number, 'comments': issue.comments})
+            return operations
+        if self.journal.has('import', id):
+            # Imported by an interrupted run, its status is polled
+            return operations
+        
+        fields = {
+            'title': issue.title,
+            'body': issue.body,
+            'milestone': issue.milestone,
+            'labels': issue.labels,
+            'assignee': issue.assignee,
+        }
+        githubissuedata = self.issueIndex.get(number) if number else None
+        if githubissuedata:
+            print("Issue %d already exists." % number)
+            # Created by a run that was interrupted before closing it
+            # or posting all of its comments
+            if issue.state == 'closed' and githubissuedata['state'] == 'open' and not self.journal.has('close', id):
+                operations.append({'op': 'close', 'id': id, 'number': number})
+            elif issue.state == 'open' and githubissuedata['state'] == 'closed' and self.syncState and not self.journal.has('reopen', id):
+                operations.append({'op': 'reopen', 'id': id, 'number': number})
+            posted, bodyPosted = self.postedComments(id, number, issue, githubissuedata)
+            if len(issue.comments) > posted:
+                operations.append({'op': 'comments', 'id': id, 'number': number, 'comments': issue.comments, 'start': posted})
+            if githubissuedata['bodyHash'] != issue.bodyHash and not bodyPosted and not self.journal.has('comment', id):
+                operations.append({'op': 'comment', 'id': id, 'number': number, 'body': issue.title + "\n\n" + issue.body})
+            if githubissuedata['title'] != issue.title and not self.journal.has('edit', id):
+                op = {'op': 'edit', 'id': id, 'number': number}
+                op.update(fields)
+                operations.append(op)
+        elif self.importApi:
+            op = {'op': 'import', 'id': id, 'number': id if self.preserveNumbers else None}
+            op.update(fields)
+            op.update({
+                'closed': issue.state == 'closed',
+                'createdAt': issue.created_on,
+                'updatedAt': issue.updated_on,
+                'comments': issue.comments,
+            })
+            operations.append(op)
+        else:
+            op = {'op': 'create', 'id': id, 'number': id if self.preserveNumbers else None}
+            op.update(fields)
+            operations.append(op)
+            # Close tickets
+            if issue.state == 'closed':
+                operations.append({'op': 'close', 'id': id, 'number': op['number']})
+            if issue.comments:
+                operations.append({'op': 'comments', 'id': id, 'number': op['number'], 'comments': issue.comments})
+        return operations
+    
+    def postedComments(self, id, number, issue, githubissuedata):
+        '''Return how many comments of issue were posted to the existing
+        github issue number and whether its changed body was posted
+        
+        The sync state knows from earlier syncs. Otherwise the comments
+        on github are listed and compared, their total also counts change
+        comments and comments of people.
+        '''
+        if self.syncState and self.syncState.postedComments(id) is not None and self.syncState.postedBody(id) is not None:
+            return self.syncState.postedComments(id), self.syncState.postedBody(id) == issue.bodyHash
+        bodies = self.fetchCommentBodies(number) if githubissuedata.get('comments') else set()
+        posted = 0
+        while posted < len(issue.comments) and issue.comments[posted].strip() in bodies:
+            posted += 1
+        return posted, (issue.title + "\n\n" + issue.body).strip() in bodies
+    
+    def executePlan(self, operations):
+        '''Send the operations to github
+        
+        Labels and milestones are created concurrently first. Issues
+        are then created in order, all other operations run in the
+        background, comments of different issues concurrently and
+        the comments of one issue in order. Operations recorded in
+        the journal are skipped.
+        
+        Imports are submitted in order as well. Their status is checked
+        every importBatch submissions and at the end until all of them
+        (including those submitted by an interrupted run) are done.
+        '''
+        self.loadImports()
+        labels = [op['name'] for op in operations if op['op'] == 'label' and not self.journal.has('label', op['name'])]
+        list(self.executor.map(lambda label: self.journaled('label', label, self.postLabel, label), labels))
+        milestones = [op['title'] for op in operations if op['op'] == 'milestone' and not self.journal.has('milestone', op['title'])]
+        list(self.executor.map(lambda title: self.journaled('milestone', title, self.createMilestone, title), milestones))
+        
+        total = len([op for op in operations if op['op'] in ('dummy', 'create', 'import', 'importDummy')])
+        done = 0
+        submitted = 0
+        for op in operations:
+            kind = op['op']
+            if kind in ('dummy', 'create', 'import', 'importDummy'):
+                self.telemetry.progress(done, total)
+                done += 1
+            if kind == 'dummy':
+                number = op['number']
+                if not self.journal.has('dummy', number):
+                    res = self.journaled('dummy', number, self.createNumberedIssue, number, "Dummy ticket %d" % number, labels=["Dummy-Ticket"])
+                    self.nodeIds[number] = res.get('node_id')
+            elif kind == 'create':
+                id = op['id']
+                if self.journal.has('issue', id):
+                    continue
+                milestone = self.milestoneNumber(op['milestone'])
+                if op['number']:
+                    res = self.createNumberedIssue(op['number'], op['title'], body=op['body'], milestone=milestone, labels=op['labels'], assignee=op['assignee'])
+                else:
+                    res = self.createIssue(op['title'], body=op['body'], milestone=milestone, labels=op['labels'], assignee=op['assignee'])
+                    self.mapNumber(id, res['number'])
+                number = res['number']
+                self.nodeIds[number] = res.get('node_id')
+                self.journal.record('issue', id, number=number)
+            elif kind in ('import', 'importDummy'):
+                key = str(op['id']) if kind == 'import' else "dummy/%d" % op['number']
+                if self.journal.has('import', key):
+                    continue
+                self.submitImport(key, op)
+                submitted += 1
+                if submitted % self.importBatch == 0:
+                    self.pollImports(wait=False)
+            elif kind == 'close' and self.graphql:
+                if not self.journal.has('close', op['id']):
+                    self.queueMutation('close', (op['id'], self.resolveNumber(op)))
+            elif kind == 'close':
+                if not self.journal.has('close', op['id']):
+                    self.submit(self.journaled, 'close', op['id'], self.closeIssue, self.resolveNumber(op))
+            elif kind == 'reopen':
+                if not self.journal.has('reopen', op['id']):
+                    self.submit(self.journaled, 'reopen', op['id'], self.reopenIssue, op['number'])
+            elif kind == 'comments':
+                self.submit(self.postComments, op['id'], self.resolveNumber(op), op['comments'], op.get('start', 0))
+            elif kind == 'comment':
+                if not self.journal.has('comment', op['id']):
+                    self.submit(self.journaled, 'comment', op['id'], self.createComment, op['number'], op['body'])
+            elif kind == 'edit' and self.graphql:
+                if not self.journal.has('edit', op['id']):
+                    self.queueMutation('edit', op)
+            elif kind == 'edit':
+                if not self.journal.has('edit', op['id']):
+                    self.submit(self.journaled, 'edit', op['id'], self.editIssue, op['number'], op['title'], body=op['body'], milestone=self.milestoneNumber(op['milestone']), labels=op['labels'], assignee=op['assignee'])
+        
+        self.flushMutations()
+        while self.pending:
+            self.pending.popleft().result()
+        self.pollImports()
+        self.telemetry.progress(done, total)
+    
+    def checkPlan(self, operations):
+        '''Raise if github already has an issue numbered like one the plan
+        still has to create, the plan is stale then (executed before or
+        the repository changed since)'''
+        pending = []
+        for op in operations:
+            if op['op'] in ('dummy', 'importDummy') and not self.journal.has('dummy', op['number']) and not self.journal.has('import', "dummy/%d" % op['number']):
+                pending.append(op['number'])
+            elif op['op'] in ('create', 'import') and op['number'] and not self.journal.has('issue', op['id']) and not self.journal.has('import', op['id']):
+                pending.append(op['number'])
+        if not pending:
+            return
+        latest = self.latestNumber()
+        if latest >= min(pending):
+            raise RuntimeError("Issue #%d exists already, the plan is stale, plan again" % latest)
+    
+    def unfinishedIssues(self, operations):
+        'Return the ids of the issues and dummy tickets with operations missing from the journal'
+        steps = {'dummy': 'dummy', 'importDummy': 'dummy', 'create': 'issue', 'import': 'issue',
+                 'close': 'close', 'reopen': 'reopen', 'comment': 'comment', 'edit': 'edit'}
+        unfinished = set()
+        for op in operations:
+            kind = op['op']
+            if kind == 'comments':
+                for i in range(op.get('start', 0), len(op['comments'])):
+                    if not self.journal.has('note', "%d/%d" % (op['id'], i)):
+                        unfinished.add(op['id'])
+            elif kind in ('dummy', 'importDummy'):
+                if not self.journal.has('dummy', op['number']):
+                    unfinished.add(op['number'])
+            elif kind in steps and not self.journal.has(steps[kind], op['id']):
+                unfinished.add(op['id'])
+        return unfinished
+    
+    def saveSyncState(self, operations):
+        '''Record the planned issues whose operations all succeeded in the
+        sync state, numbers after the first unfinished one are planned
+        again next time'''
+        # Requests still running when a failure stopped the run
+        wait(self.pending)
+        unfinished = self.unfinishedIssues(operations)
+        done = [issue for issue in self.planned if not int(issue.id) in unfinished]
+        self.syncState.update(done, min(unfinished) - 1 if unfinished else None)
+        self.syncState.save()
+    
+    def resolveNumber(self, op):
+        'Return the github number an operation applies to'
+        if op['number']:
+            return op['number']
+        # Created earlier in this run without a preserved number
+        return self.numberMap[op['id']]
+    
+    def milestoneNumber(self, title):
+        'Return the github number of the milestone title or None'
+        if not title:
+            return None
+        return self.milestones[title]['number']
+    
+    def createNumberedIssue(self, number, title, **kwargs):
+        'Create an issue that must get number, raise if github numbered it differently'
+        res = self.createIssue(title, **kwargs)
+        if res['number'] != number:
+            raise RuntimeError("Issue %d was created as #%d, the numbers are out of sync" % (number, res['number']))
+        return res
+    
+    def queueMutation(self, kind, item):
+        'Add a close or edit to the next GraphQL batch, send the batch once it is full'
+        self.mutations[kind].append(item)
+        if len(self.mutations[kind]) >= self.graphql.batchSize.size:
+            self.flushMutations(kind)
+    
+    def flushMutations(self, *kinds):
+        'Send the queued GraphQL closes and edits on the worker pool'
+        for kind in kinds or list(self.mutations):
+            if self.mutations[kind]:
+                self.submit(self.closeBatch if kind == 'close' else self.editBatch, self.mutations[kind])
+                self.mutations[kind] = []
+    
+    def resolveNodeIds(self, numbers):
+        'Return the GraphQL node ids of the issues numbers, unknown ones are looked up'
+        missing = [number for number in numbers if not self.nodeIds.get(number)]
+        if missing:
+            for (number, issuedata) in self.graphql.fetchIssues(missing).items():
+                self.nodeIds[number] = issuedata['id']
+        return [self.nodeIds[number] for number in numbers]
+    
+    def closeBatch(self, batch):
+        'Close a batch of (id, number) pairs with GraphQL mutations'
+        nodeIds = self.resolveNodeIds([number for (id, number) in batch])
+        keys = dict(zip(nodeIds, [id for (id, number) in batch]))
+        self.graphql.closeIssues(nodeIds, lambda nodeId: self.journal.record('close', keys[nodeId]))
+    
+    def editBatch(self, ops):
+        '''Edit a batch of issues with GraphQL mutations
+        
+        Title, body, milestone, labels and assignee are updated. Issues
+        whose labels or assignee have no known node id are edited
+        through the REST API instead.
+        '''
+        nodeIds = self.resolveNodeIds([op['number'] for op in ops])
+        self.resolveLabelIds(set(label.lower() for op in ops for label in op['labels'] or []))
+        self.resolveUserIds(set(op['assignee'] for op in ops if op['assignee']))
+        updates = []
+        keys = {}
+        for (nodeId, op) in zip(nodeIds, ops):
+            labelIds = [self.labelIds.get(label.lower()) for label in op['labels'] or []]
+            if None in labelIds or (op['assignee'] and not self.userIds.get(op['assignee'])):
+                self.journaled('edit', op['id'], self.editIssue, op['number'], op['title'], body=op['body'], milestone=self.milestoneNumber(op['milestone']), labels=op['labels'], assignee=op['assignee'])
+                continue
+            update = {'id': nodeId, 'title': op['title'], 'body': op['body'] or ''}
+            milestone = self.milestones.get(op['milestone']) if op['milestone'] else None
+            if milestone and milestone.get('node_id'):
+                update['milestoneId'] = milestone['node_id']
+            if labelIds:
+                update['labelIds'] = labelIds
+            if op['assignee']:
+                update['assigneeIds'] = [self.userIds[op['assignee']]]
+            updates.append(update)
+            keys[nodeId] = op['id']
+        if updates:
+            self.graphql.updateIssues(updates, lambda nodeId: self.journal.record('edit', keys[nodeId]))
+    
+    def resolveLabelIds(self, labels):
+        'Make sure the node ids of the lower cased labels are known, the labels are listed again if not'
+        if [label for label in labels if not self.labelIds.get(label)]:
+            self.fetchLabels()
+    
+    def resolveUserIds(self, logins):
+        'Look up the node ids of the users with the given logins unless they are known'
+        missing = [login for login in logins if not login in self.userIds]
+        if missing:
+            users = self.graphql.fetchUserIds(missing)
+            for login in missing:
+                self.userIds[login] = users.get(login)
+    
+    def submitImport(self, key, op):
+        'Send an import operation to github and journal its import id'
+        if op['op'] == 'importDummy':
+            res = self.importIssue("Dummy ticket %d" % op['number'], labels=["Dummy-Ticket"], closed=True)
+        else:
+            res = self.importIssue(op['title'], body=op['body'], milestone=self.milestoneNumber(op['milestone']), labels=op['labels'], assignee=op['assignee'],
+                closed=op['closed'], createdAt=op['createdAt'], updatedAt=op['updatedAt'], comments=op['comments'])
+        entry = {
+            'importId': res['id'],
+            'submitted': time.strftime('%Y-%m-%dT%H:%M:%SZ', time.gmtime()),
+            'number': op['number'],
+            'closed': op.get('closed', True),
+            'comments': len(op.get('comments', [])),
+        }
+        self.journal.record('import', key, **entry)
+        self.imports[res['id']] = (key, entry)
+    
+    def loadImports(self):
+        'Add the imports an interrupted run submitted but did not see finish'
+        for (step, key), entry in list(self.journal.steps.items()):
+            if step != 'import':
+                continue
+            if key.startswith('dummy/'):
+                done = self.journal.has('dummy', key[6:])
+            else:
+                done = self.journal.has('issue', key)
+            if not done:
+                self.imports[entry['importId']] = (key, entry)
+    
+    def pollImports(self, wait=True):
+        '''Check the status of the pending imports
+        
+        All imports since the oldest pending one are listed at once.
+        Finished ones are journaled like created issues, failures
+        raise. With wait the check is repeated until none is pending.
+        '''
+        while self.imports:
+            since = min(entry['submitted'] for (key, entry) in self.imports.values())
+            for importdata in self.client.getPaginated("import/issues?since=" + urllib.parse.quote(since), headers={'Accept': IMPORT_ACCEPT}):
+                if importdata['id'] in self.imports and importdata['status'] != 'pending':
+                    self.finishImport(importdata)
+            if not wait or not self.imports:
+                break
+            time.sleep(self.importPollInterval)
+    
+    def finishImport(self, importdata):
+        'Journal a finished import, raise if it failed or got the wrong number'
+        key, entry = self.imports.pop(importdata['id'])
+        if importdata['status'] != 'imported':
+            raise RuntimeError("Import of %s failed: %s" % (key, json.dumps(importdata.get('errors'))))
+        number = int(importdata['issue_url'].rsplit('/', 1)[1])
+        if entry['number'] and number != entry['number']:
+            raise RuntimeError("Issue %d was imported as #%d, the numbers are out of sync" % (entry['number'], number))
+        if key.startswith('dummy/'):
+            self.journal.record('dummy', number)
+            self.journal.record('close', number)
+            return
+        id = int(key)
+        if not self.preserveNumbers:
+            self.mapNumber(id, number)
+        self.journal.record('issue', id, number=number)
+        if entry['closed']:
+            self.journal.record('close', id)
+        for i in range(entry['comments']):
+            self.journal.record('note', "%d/%d" % (id, i))
+    
+    def loadNumberMap(self):
+        'Load the redmine id to github number map of previous runs'
+        self.numberMap = {}
+        if self.numberMapFile and os.path.exists(self.numberMapFile):
+            f = io.open(self.numberMapFile, 'r', encoding='utf-8')
+            for (id, number) in json.load(f).items():
+                self.numberMap[int(id)] = number
+            f.close()
+        # Issues created by an interrupted run
+        for (step, id), entry in self.journal.steps.items():
+            if step == 'issue' and 'number' in entry:
+                self.numberMap[int(id)] = entry['number']
+    
+    def mapNumber(self, id, number):
+        '''Record the github number of a newly created issue, the map is
+        written right away so a crashed run does not create it again'''
+        self.numberMap[id] = number
+        if self.numberMapFile:
+            self.saveNumberMap()
+    
+    def saveNumberMap(self):
+        'Write the redmine id to github number map'
+        # Replaced at once so that a run killed while writing keeps the old map
+        f = io.open(self.numberMapFile + '.tmp', 'w', encoding='utf-8')
+        json.dump(dict((str(id), number) for (id, number) in sorted(self.numberMap.items())), f, indent=1)
+        f.close()
+        os.replace(self.numberMapFile + '.tmp', self.numberMapFile)
+    
+    def loadSnapshot(self, path, refresh=False):
+        '''Load the repository state from a snapshot file
+        
+        If the file does not exist or refresh is set the state is
+        fetched from github and written to it.
+        '''
+        if refresh or not os.path.exists(path):
+            self.fetchMilestones()
+            self.existingLabels = self.fetchLabels()
+            self.fetchIssueIndex()
+            f = io.open(path, 'w', encoding='utf-8')
+            json.dump({
+                'labels': sorted(self.existingLabels),
+                'milestones': self.milestones,
+                'issues': self.issueIndex,
+            }, f)
+            f.close()
+            return
+        f = io.open(path, 'r', encoding='utf-8')
+        data = json.load(f)
+        f.close()
+        self.existingLabels = set(data['labels'])
+        self.milestones = data['milestones']
+        self.issueIndex = {}
+        for (number, entry) in data['issues'].items():
+            self.issueIndex[int(number)] = entry
+    
+    def fetchMilestones(self):
+        '''Load the milestones of the repository
+        
+        Open and closed milestones are paged through once, the missing
+        ones are then created before any issue is published and the
+        issues look their milestone up by title.
+        '''
+        self.milestones = {}
+        for milestonedata in self.client.getPaginated("milestones?state=all"):
+            self.milestones[milestonedata['title']] = milestonedata
+    
+    def fetchLabels(self):
+        '''Return the lower cased names of all labels of the repository
+        
+        The labels are listed once, github treats label names case
+        insensitive. Their node ids are kept for GraphQL edits.
+        '''
+        existing = set()
+        for labeldata in self.client.getPaginated("labels"):
+            existing.add(labeldata['name'].lower())
+            self.labelIds[labeldata['name'].lower()] = labeldata.get('node_id')
+        return existing
+    
+    def latestNumber(self):
+        'Return the number of the newest issue or pull request on github, 0 if there is none'
+        latest = self.client.get("issues?state=all&sort=created&direction=desc&per_page=1")
+        return latest[0]['number'] if latest else 0
+    
+    def fetchCommentBodies(self, number):
+        'Return the bodies of all comments of a github issue stripped of surrounding white space'
+        return set(commentdata['body'].strip() for commentdata in self.client.getPaginated("issues/%d/comments" % number))
+    
+    def fetchIssueIndex(self):
+        '''Load all issues of the repository into issueIndex
+        
+        The issue list is paged through once, the index maps issue
+        numbers to their title, body hash and state so that existence and
+        change checks need no further requests.
+        '''
+        self.issueIndex = {}
+        for issuedata in self.client.getPaginated("issues?state=all&sort=created&direction=asc"):
+            self.issueIndex[issuedata['number']] = self.indexEntry(issuedata)
+            self.nodeIds[issuedata['number']] = issuedata.get('node_id')
+        print("Found %d issues on github." % len(self.issueIndex))
+    
+    def indexEntry(self, issuedata):
+        'Return the issueIndex entry for a github issue'
+        return {
+            'title': issuedata['title'],
+            'bodyHash': bodyHash(issuedata['body']),
+            'state': issuedata['state'],
+            'comments': issuedata.get('comments', 0),
+        }
+    
+    def fetchIssues(self, numbers):
+        '''Load the given issues into issueIndex
+        
+        Cheaper than fetchIssueIndex when fewer issues are needed than
+        the issue list has pages, the issues are fetched concurrently or
+        in GraphQL batches.
+        '''
+        self.issueIndex = {}
+        if self.graphql:
+            for (number, issuedata) in self.graphql.fetchIssues(numbers).items():
+                self.issueIndex[number] = self.indexEntry(issuedata)
+                self.nodeIds[number] = issuedata['id']
+            return
+        for issuedata in self.executor.map(self.getIssue, numbers):
+            if issuedata:
+                self.issueIndex[issuedata['number']] = self.indexEntry(issuedata)
+    
+    def postComments(self, id, number, comments, start=0):
+        '''Post the comments of redmine issue id to github issue number in
+        order, skipping the journaled ones and those before start'''
+        for i, body in enumerate(comments[start:], start):
+            key = "%d/%d" % (id, i)
+            if not self.journal.has('note', key):
+                self.journaled('note', key, self.createComment, number, body)
+    
+    def journaled(self, step, key, fn, *args, **kwargs):
+        'Call fn and record step for key in the journal once it succeeded'
+        res = fn(*args, **kwargs)
+        self.journal.record(step, key)
+        return res
+    
+    def submit(self, fn, *args, **kwargs):
+        '''Run an order independent request on the worker pool
+        
+        At most window requests are pending, failures are raised
+        in the publishing thread.
+        '''
+        while self.pending and (self.pending[0].done() or len(self.pending) >= self.window):
+            self.pending.popleft().result()
+        self.pending.append(self.executor.submit(fn, *args, **kwargs))
     
     def getIssue(self, id):
         'Return an issue from github'
-        issueUrl = self.baseurl + "issues/" + str(id)
-        req = urllib.request.Request(issueUrl)
-        req.add_header('Authorization', 'Basic %s' % self.authData)
         try:
-            res = urllib.request.urlopen(req)
-            return json.loads(res.read().decode('utf-8'))
+            return self.client.get("issues/" + str(id))
         except urllib.error.HTTPError as e:
             if e.code == 404:
                 return None
@@ -237,8 +1199,6 @@ class RedmineIssueXML(object):
             
     def createIssue(self, title, body=None, assignee=None, milestone=None, labels=None):
         'Create an issue on github'
-        url = self.baseurl + "issues"
-        
         issuedata = {
             'title': title,
         }
@@ -251,18 +1211,43 @@ class RedmineIssueXML(object):
         if labels:
             issuedata['labels'] = labels
 
-        data = json.dumps(issuedata)
-        clen = len(data)
-        data = data.encode('utf-8')
-        
-        req = urllib.request.Request(url)
-        req.add_header('Authorization', 'Basic %s' % self.authData)
-        req.add_header('Content-Type', 'application/json')
-        req.add_header('Content-Length', str(clen))
         try:
-            res = urllib.request.urlopen(req, data)
+            res = self.client.post("issues", issuedata)
             print("Created ticket %s" % title)
-            return json.loads(res.read().decode('utf-8'))
+            return res
+        except urllib.error.HTTPError as e:
+            print(e.msg)
+            print(e.fp.read().decode('utf-8'))
+            raise e
+
+    def importIssue(self, title, body=None, assignee=None, milestone=None, labels=None, closed=False, createdAt=None, updatedAt=None, comments=None):
+        'Submit an issue with its comments to the issue import API'
+        issuedata = {
+            'title': title,
+            'body': body or '',
+            'closed': closed,
+        }
+        if assignee:
+            issuedata['assignee'] = assignee
+        if milestone:
+            issuedata['milestone'] = milestone
+        if labels:
+            issuedata['labels'] = labels
+        if createdAt:
+            issuedata['created_at'] = createdAt
+        if updatedAt:
+            issuedata['updated_at'] = updatedAt
+            if closed:
+                issuedata['closed_at'] = updatedAt
+        importdata = {
+            'issue': issuedata,
+            'comments': [{'body': body} for body in comments or []],
+        }
+        
+        try:
+            res = self.client.request('POST', "import/issues", importdata, headers={'Accept': IMPORT_ACCEPT}).json()
+            print("Imported ticket %s" % title)
+            return res
         except urllib.error.HTTPError as e:
             print(e.msg)
             print(e.fp.read().decode('utf-8'))
@@ -270,8 +1255,6 @@ class RedmineIssueXML(object):
 
     def editIssue(self, id, title, body=None, assignee=None, milestone=None, labels=None):
         'Edit an existing issue on github'
-        url = self.baseurl + "issues"
-        
         issuedata = {
             'title': title,
         }
@@ -284,45 +1267,24 @@ class RedmineIssueXML(object):
         if labels:
             issuedata['labels'] = labels
         
-        data = json.dumps(issuedata)
-        clen = len(data)
-        data = data.encode('utf-8')
-        
-        req = urllib.request.Request(url)
-        req.method = "PATCH"
-        req.add_header('Authorization', 'Basic %s' % self.authData)
-        req.add_header('Content-Type', 'application/json')
-        req.add_header('Content-Length', str(clen))
         try:
-            res = urllib.request.urlopen(req, data)
+            res = self.client.patch("issues/" + str(id), issuedata)
             print("Edited ticket %s" % title)
-            return json.loads(res.read().decode('utf-8'))
+            return res
         except urllib.error.HTTPError as e:
             print(e.msg)
             print(e.fp.read().decode('utf-8'))
             raise e
-'''
-    
-'''
+
     def createComment(self, id, body):
         'Add a comment to an issue'
-        url = self.baseurl + "issues/" + id + "/comments"
-        
         commentdata = {
             'body': body,
         }
-        data = json.dumps(commentdata)
-        clen = len(data)
-        data = data.encode('utf-8')
-        
-        req = urllib.request.Request(url)
-        req.add_header('Authorization', 'Basic %s' % self.authData)
-        req.add_header('Content-Type', 'application/json')
-        req.add_header('Content-Length', str(clen))
         try:
-            res = urllib.request.urlopen(req, data)
+            res = self.client.post("issues/" + str(id) + "/comments", commentdata)
             print("Added comment to ticket %s" % id)
-            return json.loads(res.read().decode('utf-8'))
+            return res
         except urllib.error.HTTPError as e:
             print(e.msg)
             print(e.fp.read().decode('utf-8'))
@@ -330,24 +1292,27 @@ class RedmineIssueXML(object):
     
     def closeIssue(self, id):
         'Close an issue'
-        url = self.baseurl + "issues/" + str(id)
-        
         issuedata = {
             'state': 'closed',
         }
-        data = json.dumps(issuedata)
-        clen = len(data)
-        data = data.encode('utf-8')
-        
-        req = MyRequest(url)
-        req.method = 'PATCH'
-        req.add_header('Authorization', 'Basic %s' % self.authData)
-        req.add_header('Content-Type', 'application/json')
-        req.add_header('Content-Length', str(clen))
         try:
-            res = urllib.request.urlopen(req, data)
+            res = self.client.patch("issues/" + str(id), issuedata)
             print("Closed issue %d" % int(id))
-            return json.loads(res.read().decode('utf-8'))
+            return res
+        except urllib.error.HTTPError as e:
+            print(e.msg)
+            print(e.fp.read().decode('utf-8'))
+            raise e
+    
+    def reopenIssue(self, id):
+        'Reopen an issue'
+        issuedata = {
+            'state': 'open',
+        }
+        try:
+            res = self.client.patch("issues/" + str(id), issuedata)
+            print("Reopened issue %d" % int(id))
+            return res
         except urllib.error.HTTPError as e:
             print(e.msg)
             print(e.fp.read().decode('utf-8'))
@@ -355,12 +1320,8 @@ class RedmineIssueXML(object):
     
     def getLabel(self, label):
         'Fetch a label'
-        issueUrl = self.baseurl + "labels/" + label
-        req = urllib.request.Request(issueUrl)
-        req.add_header('Authorization', 'Basic %s' % self.authData)
         try:
-            res = urllib.request.urlopen(req)
-            return json.loads(res.read().decode('utf-8'))
+            return self.client.get("labels/" + urllib.parse.quote(label))
         except urllib.error.HTTPError as e:
             if e.code == 404:
                 return None
@@ -368,65 +1329,47 @@ class RedmineIssueXML(object):
                 raise e    
     
     def createLabel(self, label):
-        'Create a label'
+        'Create a label unless it exists'
         if self.getLabel(label) is not None:
             return
-        
-        url = self.baseurl + "labels"
-        
+        return self.postLabel(label)
+    
+    def postLabel(self, label):
+        '''Create a label without checking whether it exists, a label
+        that does exist already (planned against a stale state) is
+        fetched instead'''
         labeldata = {
             'name': label,
         }
-        data = json.dumps(labeldata)
-        clen = len(data)
-        data = data.encode('utf-8')
-        
-        req = urllib.request.Request(url)
-        req.add_header('Authorization', 'Basic %s' % self.authData)
-        req.add_header('Content-Type', 'application/json')
-        req.add_header('Content-Length', str(clen))
         try:
-            res = urllib.request.urlopen(req, data)
+            res = self.client.post("labels", labeldata)
             print("Created label %s" % label)
-            return json.loads(res.read().decode('utf-8'))
         except urllib.error.HTTPError as e:
-            print(e.msg)
-            print(e.fp.read().decode('utf-8'))
-            raise e
+            body = e.fp.read().decode('utf-8')
+            if not alreadyExists(e, body):
+                print(e.msg)
+                print(body)
+                raise e
+            print("Label %s exists already" % label)
+            res = self.getLabel(label) or {}
+        self.labelIds[label.lower()] = res.get('node_id')
+        return res
     
     def createMilestone(self, title):
-        'Create a milestone'
-        data = json.dumps({'title':title})
-        clen = len(data)
-        data = data.encode('utf-8')
-        url = self.baseurl + "milestones"
-        
-        req = urllib.request.Request(url)
-        req.add_header('Authorization', 'Basic %s' % self.authData)
-        req.add_header('Content-Type', 'application/json')
-        req.add_header('Content-Length', str(clen))
+        '''Create a milestone, a milestone that does exist already
+        (planned against a stale state) is looked up instead'''
         try:
-            res = urllib.request.urlopen(req, data)
+            milestone = self.client.post("milestones", {'title': title})
             print("Created milestone %s" % title)
-            milestone = json.loads(res.read().decode('utf-8'))
-            self.milestones[title] = milestone
         except urllib.error.HTTPError as e:
-            print(e.msg)
-            print(e.fp.read().decode('utf-8'))
-            raise e
-        
-        
-class MyRequest(urllib.request.Request):
-    'This class adds custom HTTP method support'
-    
-    def get_method(self):
-        if self.method is not None:
-            return self.method
-        else:
-            if self.data is not None:
-                return "POST"
-            else:
-                return "GET"
+            body = e.fp.read().decode('utf-8')
+            if not alreadyExists(e, body):
+                print(e.msg)
+                print(body)
+                raise e
+            print("Milestone %s exists already" % title)
+            milestone = [milestonedata for milestonedata in self.client.getPaginated("milestones?state=all") if milestonedata['title'] == title][0]
+        self.milestones[title] = milestone
 
 if __name__ == '__main__':   
     issuesfile = 'MaintenanceServiceIssues.xml'
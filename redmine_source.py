@@ -0,0 +1,112 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
+
+'''Fetches the issues of a project straight from the redmine REST API
+
+Redmine returns at most 100 issues per request. The first page tells
+the total count, the remaining pages are then fetched concurrently
+and handed out as soon as they arrive, so that their conversion
+overlaps with the download. Journals are only returned
+for single issues, with journals enabled every issue of a page is
+fetched again (concurrently) including its journals and attachments.
+
+@see http://www.redmine.org/projects/redmine/wiki/Rest_Issues'''
+
+import re
+import urllib.request
+import urllib.parse
+from base64 import encodebytes as base64
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from xml.etree.ElementTree import fromstring
+
+XML_DECLARATION = re.compile(br'^\s*<\?xml[^>]*\?>')
+
+class RedmineSource(object):
+    'The issues.xml pages of a redmine project'
+
+    def __init__(self, url, projectId, apiKey=None, user=None, password=None, params=None, workers=4, limit=100, journals=False):
+        '''
+        url: the redmine base url, e.g. https://redmine.example.com
+        projectId: the id or identifier of the project
+        apiKey: your redmine API key
+        user: your redmine username, if no API key is given
+        password: your redmine password, if no API key is given
+        params: additional query parameters for issues.xml
+        workers: the number of pages fetched concurrently
+        limit: the number of issues per page, redmine allows 100 at most
+        journals: fetch the journals and attachments of every issue
+        '''
+        self.baseurl = url.rstrip('/')
+        self.url = self.baseurl + '/issues.xml'
+        self.params = {
+            'project_id': projectId,
+            'status_id': '*',
+            'sort': 'id',
+        }
+        if params:
+            self.params.update(params)
+        self.workers = workers
+        self.limit = limit
+        self.journals = journals
+        self.headers = {}
+        if apiKey:
+            self.headers['X-Redmine-API-Key'] = apiKey
+        elif user:
+            authData = base64(bytes(('%s:%s' % (user, password)), 'utf-8')).decode().replace('\n', '')
+            self.headers['Authorization'] = 'Basic %s' % authData
+
+    def fetch(self, url):
+        'Return the body of url'
+        req = urllib.request.Request(url, headers=self.headers)
+        res = urllib.request.urlopen(req)
+        try:
+            return res.read()
+        finally:
+            res.close()
+
+    def fetchPage(self, offset):
+        'Return the raw XML of the page starting at offset'
+        params = dict(self.params)
+        params['offset'] = offset
+        params['limit'] = self.limit
+        return self.fetch(self.url + '?' + urllib.parse.urlencode(params))
+
+    def fetchIssue(self, id):
+        'Return the raw XML of a single issue including journals and attachments'
+        return self.fetch("%s/issues/%s.xml?include=journals,attachments" % (self.baseurl, id))
+
+    def withJournals(self, page, executor):
+        'Return page with every issue replaced by its full version'
+        ids = [issue.findtext('id') for issue in fromstring(page).findall('issue')]
+        issues = [XML_DECLARATION.sub(b'', doc) for doc in executor.map(self.fetchIssue, ids)]
+        return b'<issues>' + b''.join(issues) + b'</issues>'
+
+    def iterPages(self):
+        '''Yield the raw XML of every page
+
+        Pages after the first one are yielded in the order they
+        arrive, not in offset order.
+        '''
+        first = self.fetchPage(0)
+        total = int(fromstring(first).get('total_count', 0))
+        executor = ThreadPoolExecutor(max_workers=self.workers)
+        futures = []
+        try:
+            # Start downloading before the first page is handed out
+            for offset in range(self.limit, total, self.limit):
+                futures.append(executor.submit(self.fetchPage, offset))
+            for page in self.completed(first, futures):
+                if self.journals:
+                    page = self.withJournals(page, executor)
+                yield page
+        finally:
+            for future in futures:
+                future.cancel()
+            executor.shutdown()
+
+    def completed(self, first, futures):
+        'Yield first and then the pages of futures as they complete'
+        yield first
+        for future in as_completed(futures):
+            yield future.result()
@@ -0,0 +1,81 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
+
+'''Remembers what an incremental sync already published
+
+The state file keeps the highest redmine updated_on seen, the highest
+issue number handled, and per issue a content hash, the number of
+posted comments and the hash of the body github shows, as the issue
+body or as a change comment. Later runs only process issues that were updated
+or whose content changed since.'''
+
+import io
+import os
+import json
+
+class SyncState(object):
+    'The high-water mark and issue hashes of the last sync'
+
+    def __init__(self, path):
+        '''
+        path: the JSON state file, a missing file means nothing
+              was synced yet
+        '''
+        self.path = path
+        self.highWaterMark = ''
+        self.maxId = 0
+        self.hashes = {}
+        self.comments = {}
+        self.bodies = {}
+        if os.path.exists(path):
+            f = io.open(path, 'r', encoding='utf-8')
+            data = json.load(f)
+            f.close()
+            self.highWaterMark = data['highWaterMark']
+            self.maxId = data['maxId']
+            self.hashes = data['hashes']
+            self.comments = data.get('comments', {})
+            self.bodies = data.get('bodies', {})
+
+    def changed(self, issue):
+        'Return whether a github issue needs to be published again'
+        if issue.updated_on > self.highWaterMark:
+            return True
+        return self.hashes.get(str(issue.id)) != issue.contentHash()
+
+    def postedComments(self, id):
+        'Return the number of comments synced for issue id or None if unknown'
+        return self.comments.get(str(id))
+
+    def postedBody(self, id):
+        'Return the body hash synced for issue id or None if unknown'
+        return self.bodies.get(str(id))
+
+    def update(self, issues, maxId=None):
+        '''Record issues as published
+
+        maxId: the highest number handled may not go beyond this
+        '''
+        for issue in issues:
+            self.hashes[str(issue.id)] = issue.contentHash()
+            self.comments[str(issue.id)] = len(issue.comments)
+            self.bodies[str(issue.id)] = issue.bodyHash
+            if issue.updated_on > self.highWaterMark:
+                self.highWaterMark = issue.updated_on
+            if maxId is None or int(issue.id) <= maxId:
+                self.maxId = max(self.maxId, int(issue.id))
+
+    def save(self):
+        'Write the state file, replacing the old one atomically'
+        tmp = self.path + '.tmp'
+        f = io.open(tmp, 'w', encoding='utf-8')
+        json.dump({
+            'highWaterMark': self.highWaterMark,
+            'maxId': self.maxId,
+            'hashes': self.hashes,
+            'comments': self.comments,
+            'bodies': self.bodies,
+        }, f)
+        f.close()
+        os.replace(tmp, self.path)
@@ -0,0 +1,144 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
+
+'''Per-request instrumentation and progress reporting
+
+GithubClient reports every request here: endpoint, status, latency,
+bytes and retries. Requests are written to a JSON lines log and
+summed up per endpoint with a latency histogram, so the wall time of
+a migration can be attributed to probes, creates, closes or label
+checks. Publishing reports its progress for issues per second and an
+ETA.'''
+
+import io
+import re
+import json
+import time
+import bisect
+import threading
+
+# Upper bounds of the latency histogram buckets in milliseconds
+BUCKETS = [10, 25, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000]
+
+def endpointName(method, path):
+    'Return method and path with ids and names replaced by placeholders'
+    path = path.split('?', 1)[0]
+    path = re.sub(r'^(/api/v3)?/repos/[^/]+/[^/]+', '', path)
+    path = re.sub(r'/labels/[^/]+', '/labels/:name', path)
+    path = re.sub(r'/\d+', '/:n', path)
+    return "%s %s" % (method, path)
+
+class EndpointStats(object):
+    'Request count, bytes, retries and latency histogram of one endpoint'
+
+    def __init__(self):
+        self.requests = 0
+        self.errors = 0
+        self.retries = 0
+        self.bytes = 0
+        self.seconds = 0.0
+        self.histogram = [0] * (len(BUCKETS) + 1)
+
+    def add(self, status, latency, size, retries):
+        self.requests += 1
+        if not status or status >= 400:
+            self.errors += 1
+        self.retries += retries
+        self.bytes += size
+        self.seconds += latency
+        self.histogram[bisect.bisect_left(BUCKETS, latency * 1000)] += 1
+
+    def percentile(self, p):
+        'Return the upper bound in ms of the bucket holding percentile p'
+        wanted = self.requests * p / 100.0
+        seen = 0
+        for (i, count) in enumerate(self.histogram):
+            seen += count
+            if seen >= wanted and count:
+                return BUCKETS[i] if i < len(BUCKETS) else float('inf')
+        return 0
+
+class Telemetry(object):
+    'Collects request metrics and publishing progress'
+
+    def __init__(self, logFile=None, summaryInterval=30.0):
+        '''
+        logFile: path of the JSON lines request log, None for no log
+        summaryInterval: seconds between two live progress lines
+        '''
+        self.lock = threading.Lock()
+        self.endpoints = {}
+        self.started = time.time()
+        self.summaryInterval = summaryInterval
+        self.lastSummary = self.started
+        self.progressStarted = None
+        self.done = 0
+        self.total = 0
+        self.log = io.open(logFile, 'a', encoding='utf-8') if logFile else None
+
+    def record(self, method, path, status, latency, size, retries):
+        '''Record a finished request
+
+        status is 0 if no response was received.
+        '''
+        endpoint = endpointName(method, path)
+        with self.lock:
+            stats = self.endpoints.get(endpoint)
+            if stats is None:
+                stats = self.endpoints[endpoint] = EndpointStats()
+            stats.add(status, latency, size, retries)
+            if self.log:
+                self.log.write(json.dumps({
+                    'time': time.time(),
+                    'endpoint': endpoint,
+                    'path': path,
+                    'status': status,
+                    'latency': round(latency, 4),
+                    'bytes': size,
+                    'retries': retries,
+                }) + "\n")
+
+    def progress(self, done, total):
+        'Report done of total issues published, prints a live line every summaryInterval'
+        now = time.time()
+        with self.lock:
+            if self.progressStarted is None:
+                self.progressStarted = now
+            self.done = done
+            self.total = total
+            if now - self.lastSummary < self.summaryInterval and done < total:
+                return
+            self.lastSummary = now
+        print(self.progressLine())
+
+    def progressLine(self):
+        'Return issues per second and ETA as a line of text'
+        elapsed = time.time() - (self.progressStarted or self.started)
+        rate = self.done / elapsed if elapsed else 0.0
+        eta = (self.total - self.done) / rate if rate else float('inf')
+        requests = sum(stats.requests for stats in list(self.endpoints.values()))
+        return "%d/%d issues, %.2f issues/s, ETA %s, %d requests" % (self.done, self.total, rate, formatSeconds(eta), requests)
+
+    def summary(self):
+        'Return the per endpoint summary as text, slowest endpoints first'
+        lines = ["%-32s %8s %7s %7s %9s %8s %8s %10s" % ('endpoint', 'requests', 'errors', 'retries', 'seconds', 'p50 ms', 'p95 ms', 'bytes')]
+        with self.lock:
+            endpoints = sorted(self.endpoints.items(), key=lambda item: -item[1].seconds)
+            for (endpoint, stats) in endpoints:
+                lines.append("%-32s %8d %7d %7d %9.1f %8s %8s %10d" % (endpoint, stats.requests, stats.errors, stats.retries,
+                    stats.seconds, stats.percentile(50), stats.percentile(95), stats.bytes))
+        return "\n".join(lines)
+
+    def close(self):
+        'Close the request log'
+        if self.log:
+            self.log.close()
+            self.log = None
+
+def formatSeconds(seconds):
+    'Return seconds as h:mm:ss'
+    if seconds == float('inf'):
+        return '?'
+    seconds = int(seconds)
+    return "%d:%02d:%02d" % (seconds // 3600, seconds // 60 % 60, seconds % 60)
@@ -0,0 +1,118 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
+
+'''Tests of GithubClient and RequestScheduler against the local FakeGithub
+
+Run with python3 -m unittest test_github_client'''
+
+import time
+import unittest
+from multiprocessing import Manager
+from concurrent.futures import ThreadPoolExecutor
+from github_client import GithubClient, RequestScheduler, WritePacer
+from github_graphql import GraphqlClient
+from fake_github import FakeGithub
+
+class RequestSchedulerTest(unittest.TestCase):
+
+    def testRetryAfterIsJittered(self):
+        scheduler = RequestScheduler(backoff=1.0)
+        delays = [scheduler.retryDelay('POST', 0, 403, {'Retry-After': '2'}, b'secondary rate limit') for i in range(20)]
+        self.assertTrue(all(2.0 <= delay <= 3.0 for delay in delays))
+        self.assertTrue(len(set(delays)) > 1)
+
+    def testExhaustedQuotaWaitsForReset(self):
+        scheduler = RequestScheduler(backoff=1.0)
+        reset = int(time.time()) + 60
+        delay = scheduler.retryDelay('GET', 0, 403, {'X-RateLimit-Remaining': '0', 'X-RateLimit-Reset': str(reset)}, b'API rate limit exceeded')
+        self.assertTrue(59 <= delay <= 63)
+
+    def testOtherForbiddenIsNotRetried(self):
+        scheduler = RequestScheduler()
+        self.assertIsNone(scheduler.retryDelay('POST', 0, 403, {}, b'Must have admin rights'))
+
+    def testThreadsAreStaggeredAfterPause(self):
+        scheduler = RequestScheduler(writeInterval=0.0, recoverySpacing=0.1)
+        scheduler.pause(0.1)
+        executor = ThreadPoolExecutor(max_workers=4)
+        times = sorted(executor.map(lambda i: scheduler.acquire('GET') or time.monotonic(), range(4)))
+        executor.shutdown()
+        gaps = [later - earlier for (earlier, later) in zip(times, times[1:])]
+        self.assertTrue(min(gaps) >= 0.09, gaps)
+
+    def testPacerSpacesWritesOfAllSchedulers(self):
+        manager = Manager()
+        pacer = WritePacer(manager.Lock(), manager.Value('d', 0.0), 0.1)
+        schedulers = [RequestScheduler(writeInterval=0.0, pacer=pacer) for i in range(3)]
+        executor = ThreadPoolExecutor(max_workers=3)
+        times = sorted(executor.map(lambda scheduler: scheduler.acquire('POST') or time.time(), schedulers * 2))
+        executor.shutdown()
+        manager.shutdown()
+        gaps = [later - earlier for (earlier, later) in zip(times, times[1:])]
+        self.assertTrue(min(gaps) >= 0.09, gaps)
+
+class GithubClientTest(unittest.TestCase):
+
+    def tearDown(self):
+        self.github.stop()
+
+    def testSecondaryRateLimitIsRetried(self):
+        self.github = FakeGithub(minWriteInterval=0.05, retryAfter=0)
+        scheduler = RequestScheduler(writeInterval=0.0, backoff=0.2)
+        client = GithubClient('o', 'r', 'user', 'password', apiUrl=self.github.apiUrl, scheduler=scheduler)
+        executor = ThreadPoolExecutor(max_workers=4)
+        list(executor.map(lambda i: client.post("labels", {'name': "label %d" % i}), range(12)))
+        executor.shutdown()
+        client.close()
+        self.assertEqual(len(self.github.repository('o/r').labels), 12)
+        self.assertTrue(self.github.throttled > 0)
+        self.assertEqual(scheduler.stats()['retries'], self.github.throttled)
+
+    def testQuotaIsTracked(self):
+        self.github = FakeGithub(quota=100)
+        scheduler = RequestScheduler()
+        client = GithubClient('o', 'r', 'user', 'password', apiUrl=self.github.apiUrl, scheduler=scheduler)
+        for i in range(3):
+            client.get("labels")
+        client.close()
+        self.assertEqual(scheduler.remaining, 97)
+
+    def testGraphqlQuotaIsTrackedSeparately(self):
+        self.github = FakeGithub(quota=100)
+        scheduler = RequestScheduler()
+        client = GithubClient('o', 'r', 'user', 'password', apiUrl=self.github.apiUrl, scheduler=scheduler)
+        graphql = GraphqlClient(client, 'o', 'r')
+        client.get("labels")
+        for i in range(5):
+            graphql.fetchIssues([1])
+        client.close()
+        self.assertEqual(scheduler.remaining, 99)
+        self.assertEqual(scheduler.quota('graphql')[0], 95)
+
+    def testPagination(self):
+        self.github = FakeGithub()
+        labels = self.github.repository('o/r').labels
+        for i in range(250):
+            labels["label %d" % i] = {'name': "label %d" % i, 'color': 'ededed'}
+        client = GithubClient('o', 'r', 'user', 'password', apiUrl=self.github.apiUrl)
+        self.assertEqual(len(list(client.getPaginated("labels"))), 250)
+        client.close()
+        self.assertEqual(self.github.requests['GET'], 3)
+
+    def testGraphqlQueriesArePacedAsReads(self):
+        self.github = FakeGithub(minWriteInterval=0.5)
+        scheduler = RequestScheduler(writeInterval=0.5)
+        client = GithubClient('o', 'r', 'user', 'password', apiUrl=self.github.apiUrl, scheduler=scheduler)
+        graphql = GraphqlClient(client, 'o', 'r')
+        started = time.monotonic()
+        for i in range(3):
+            graphql.fetchIssues([1])
+            graphql.fetchUserIds(['user'])
+        client.close()
+        self.assertTrue(time.monotonic() - started < 0.5)
+        self.assertEqual(scheduler.writes, 0)
+        self.assertEqual(self.github.throttled, 0)
+
+if __name__ == '__main__':
+    unittest.main()
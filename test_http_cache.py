@@ -0,0 +1,58 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
+
+'''Tests of the ResponseCache
+
+Run with python3 -m unittest test_http_cache'''
+
+import os
+import shutil
+import tempfile
+import unittest
+from http_cache import ResponseCache
+
+class ResponseCacheTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'cache.db')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def testResponsesSurviveClose(self):
+        cache = ResponseCache(self.path)
+        cache.put('labels', '"etag"', {'Link': None}, b'[]')
+        cache.close()
+        cache = ResponseCache(self.path)
+        self.assertEqual(cache.get('labels'), ('"etag"', {'Link': None}, b'[]'))
+        self.assertIsNone(cache.get('milestones'))
+        cache.close()
+
+    def testReadsAreCommittedInBatches(self):
+        cache = ResponseCache(self.path)
+        cache.put('labels', '"etag"', {}, b'[]')
+        commits = []
+        commit = cache.commit
+        cache.commit = lambda: commits.append(1) or commit()
+        for i in range(cache.commitInterval * 3):
+            cache.get('labels')
+        self.assertEqual(len(commits), 3)
+        cache.close()
+
+    def testEvictsLeastRecentlyUsedDownToLowWater(self):
+        cache = ResponseCache(self.path, maxBytes=1000)
+        for i in range(10):
+            cache.put("page %d" % i, '"etag"', {}, b'x' * 100)
+        cache.get('page 0')
+        cache.put('page 10', '"etag"', {}, b'x' * 100)
+        self.assertTrue(cache.size <= 900)
+        self.assertIsNotNone(cache.get('page 0'))
+        self.assertIsNone(cache.get('page 1'))
+        self.assertIsNone(cache.get('page 2'))
+        self.assertIsNotNone(cache.get('page 3'))
+        cache.close()
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
+
+'''Tests of publishing issues to the local FakeGithub
+
+Run with python3 -m unittest test_redmine_issues_to_github'''
+
+import io
+import os
+import json
+import shutil
+import tempfile
+import unittest
+import contextlib
+from fake_github import FakeGithub
+from benchmark import generateExport
+from redmine_issues_to_github import RedmineIssueXML, GithubIssue
+
+# Text split by CDATA sections, entities, comments and nested issues
+TRICKY_EXPORT = '''<?xml version="1.0" encoding="UTF-8"?>
+<issues total_count="2" offset="0" limit="25" type="array">
+<issue><id>1</id><project id="1" name="Project"/><tracker id="1" name="Bug"/>
+<status id="5" name="Closed"/><priority id="2" name="Normal"/><author id="1" name="User 1"/>
+<subject>Fish &amp; chips <!-- a comment -->for <![CDATA[<everyone>]]></subject>
+<description>  <![CDATA[x]]> tail
+second line  </description>
+<created_on>2012-01-01T10:00:00Z</created_on><updated_on>2012-02-01T10:00:00Z</updated_on>
+<children type="array"><issue id="2"><tracker id="1" name="Bug"/><subject>Child</subject></issue></children>
+<journals type="array">
+<journal id="1"><user id="1" name="User 1"/><notes><![CDATA[a note]]> &lt;b&gt;</notes><created_on>2012-01-02T10:00:00Z</created_on><private_notes>false</private_notes><details type="array"/></journal>
+</journals>
+</issue>
+<issue><id>2</id><project id="1" name="Project"/><tracker id="1" name="Bug"/>
+<status id="1" name="New"/><priority id="2" name="Normal"/><author id="1" name="User 1"/>
+<parent id="1"/><subject>Child</subject><description/>
+<created_on>2012-01-01T11:00:00Z</created_on><updated_on>2012-02-01T10:00:00Z</updated_on>
+</issue>
+</issues>
+'''
+
+def issueFields(rix):
+    'Return the fields of the github issues of rix in order'
+    return [[getattr(issue, name) for name in GithubIssue.__slots__] for issue in rix.githubIssues]
+
+class ReadXMLTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def assertSameIssues(self, export):
+        'Read export with both readers and compare the github issues'
+        dom = RedmineIssueXML()
+        streaming = RedmineIssueXML()
+        with contextlib.redirect_stdout(io.StringIO()):
+            dom.readXML(export, [5, 6], {1: 'user'})
+            streaming.readXML(export, [5, 6], {1: 'user'}, streaming=True)
+        self.assertEqual(issueFields(dom), issueFields(streaming))
+        return streaming
+
+    def testGeneratedExport(self):
+        generateExport(os.path.join(self.dir, 'issues.xml'), 50, journals=3, sparsity=3)
+        self.assertSameIssues(os.path.join(self.dir, 'issues.xml'))
+
+    def testCdataEntitiesAndComments(self):
+        f = io.open(os.path.join(self.dir, 'issues.xml'), 'w', encoding='utf-8')
+        f.write(TRICKY_EXPORT)
+        f.close()
+        rix = self.assertSameIssues(os.path.join(self.dir, 'issues.xml'))
+        self.assertEqual(rix.githubIssues[0].title, 'Fish & chips for <everyone>')
+        self.assertTrue("x tail\nsecond line" in rix.githubIssues[0].body)
+        self.assertTrue('a note <b>' in rix.githubIssues[0].comments[0])
+        self.assertEqual(len(rix.githubIssues), 2)
+
+class CrashingIssueXML(RedmineIssueXML):
+    'Fails the create after crashAfter issues were created'
+
+    crashAfter = None
+
+    def createIssue(self, title, **kwargs):
+        if self.crashAfter is not None:
+            if self.crashAfter == 0:
+                raise RuntimeError("crash")
+            self.crashAfter -= 1
+        return RedmineIssueXML.createIssue(self, title, **kwargs)
+
+class PublishTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.github = FakeGithub()
+
+    def tearDown(self):
+        self.github.stop()
+        shutil.rmtree(self.dir)
+
+    def path(self, name):
+        return os.path.join(self.dir, name)
+
+    def publish(self, export, crashAfter=None, change=None, **kwargs):
+        '''Read export and publish it quietly, return the RedmineIssueXML
+
+        change is called with the issues by id before they are published.
+        '''
+        rix = CrashingIssueXML()
+        rix.crashAfter = crashAfter
+        with contextlib.redirect_stdout(io.StringIO()):
+            rix.readXML(export, [5, 6], {}, streaming=True)
+            if change:
+                change(dict((int(issue.id), issue) for issue in rix.githubIssues))
+            rix.publishIssues('o', 'r', 'user', 'password', apiUrl=self.github.apiUrl, writeInterval=0, **kwargs)
+        return rix
+
+    def testNumberMapSurvivesCrash(self):
+        generateExport(self.path('issues.xml'), 20, sparsity=2)
+        numberMap = self.path('numbers.json')
+        with self.assertRaises(RuntimeError):
+            self.publish(self.path('issues.xml'), crashAfter=7, preserveNumbers=False, numberMap=numberMap)
+        f = io.open(numberMap, 'r', encoding='utf-8')
+        self.assertEqual(len(json.load(f)), 7)
+        f.close()
+        rix = self.publish(self.path('issues.xml'), preserveNumbers=False, numberMap=numberMap)
+        self.assertEqual(len(self.github.repository('o/r').issues), len(rix.githubIssues))
+
+    def testRerunPostsOnlyNewComments(self):
+        generateExport(self.path('issues.xml'), 5, journals=1)
+        self.publish(self.path('issues.xml'))
+        repo = self.github.repository('o/r')
+        # Changed on github and commented by a person
+        repo.issues[3]['body'] = 'edited on github'
+        repo.comments[3].append('a comment of a person')
+        repo.issues[3]['comments'] += 1
+        self.publish(self.path('issues.xml'))
+        self.assertEqual(len(repo.comments[3]), 3)
+        def addNote(issues):
+            issues[3].comments.append('new note B')
+        self.publish(self.path('issues.xml'), change=addNote)
+        self.publish(self.path('issues.xml'), change=addNote)
+        self.assertEqual(repo.comments[3][3:], ['new note B'])
+
+    def testIssuesAreListedOrProbedByRequestCount(self):
+        generateExport(self.path('issues.xml'), 63)
+        self.publish(self.path('issues.xml'), dryRun=self.path('plan.json'))
+        # Nothing to look up on an empty repository
+        self.assertEqual(self.github.endpoints.get('GET /issues/:n', 0), 0)
+        self.assertEqual(self.github.endpoints['GET /issues'], 1)
+        self.publish(self.path('issues.xml'))
+        self.github.endpoints.clear()
+        self.publish(self.path('issues.xml'), dryRun=self.path('plan.json'))
+        # One page lists all 63 issues
+        self.assertEqual(self.github.endpoints.get('GET /issues/:n', 0), 0)
+        self.assertEqual(self.github.endpoints['GET /issues'], 2)
+        self.publish(self.path('issues.xml'), syncState=self.path('sync.json'))
+        self.github.endpoints.clear()
+        def changeOne(issues):
+            issues[7].title = 'changed'
+        self.publish(self.path('issues.xml'), change=changeOne, syncState=self.path('sync.json'), dryRun=self.path('plan.json'))
+        # A single changed issue is probed
+        self.assertEqual(self.github.endpoints['GET /issues/:n'], 1)
+        self.assertEqual(self.github.endpoints['GET /issues'], 1)
+
+    def testStalePlanAndSnapshot(self):
+        generateExport(self.path('issues.xml'), 10)
+        plan = self.path('plan.json')
+        snapshot = self.path('snapshot.json')
+        self.publish(self.path('issues.xml'), dryRun=plan, snapshot=snapshot)
+        repo = self.github.repository('o/r')
+        # Created by someone else after planning
+        rix = self.publish(self.path('issues.xml'), dryRun=self.path('other.json'))
+        for label in set(label for issue in rix.githubIssues for label in issue.labels):
+            repo.labels[label] = {'name': label, 'color': 'ededed'}
+        repo.milestones['Version 1'] = {'number': 1, 'title': 'Version 1', 'state': 'open'}
+        self.publish(self.path('issues.xml'), plan=plan)
+        self.assertEqual(len(repo.issues), 10)
+        with self.assertRaises(RuntimeError):
+            self.publish(self.path('issues.xml'), plan=plan)
+        self.publish(self.path('issues.xml'), snapshot=snapshot)
+        self.assertEqual(len(repo.issues), 10)
+
+if __name__ == '__main__':
+    unittest.main()
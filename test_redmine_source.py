@@ -0,0 +1,71 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+# vim: tabstop=4 expandtab shiftwidth=4 softtabstop=4
+
+'''Tests of RedmineSource against the local FakeRedmine
+
+Run with python3 -m unittest test_redmine_source'''
+
+import io
+import os
+import shutil
+import tempfile
+import unittest
+import contextlib
+from concurrent.futures import ThreadPoolExecutor
+from xml.etree.ElementTree import fromstring
+from fake_redmine import FakeRedmine
+from benchmark import generateExport
+from redmine_source import RedmineSource
+from redmine_issues_to_github import RedmineIssueXML, GithubIssue
+
+def issueFields(rix):
+    'Return the fields of the github issues of rix by id'
+    return dict((issue.id, [getattr(issue, name) for name in GithubIssue.__slots__]) for issue in rix.githubIssues)
+
+class RedmineSourceTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.export = os.path.join(self.dir, 'issues.xml')
+
+    def tearDown(self):
+        self.redmine.stop()
+        shutil.rmtree(self.dir)
+
+    def testAllPagesOfTotalCount(self):
+        generateExport(self.export, 250, sparsity=3)
+        self.redmine = FakeRedmine(self.export)
+        source = RedmineSource(self.redmine.url, 'project', apiKey='key')
+        ids = [issue.findtext('id') for page in source.iterPages() for issue in fromstring(page).findall('issue')]
+        self.assertEqual(sorted(int(id) for id in ids), self.redmine.ids)
+        self.assertEqual(self.redmine.requests, 3)
+        self.assertEqual(self.redmine.apiKeys, set(['key']))
+
+    def testPagesAreFetchedConcurrently(self):
+        generateExport(self.export, 500)
+        self.redmine = FakeRedmine(self.export, latency=0.1)
+        source = RedmineSource(self.redmine.url, 'project', workers=4, limit=50)
+        self.assertEqual(len(list(source.iterPages())), 10)
+        self.assertTrue(self.redmine.maxPages > 1)
+
+    def testJournalsAreFetchedPerIssue(self):
+        generateExport(self.export, 120, journals=2)
+        self.redmine = FakeRedmine(self.export)
+        source = RedmineSource(self.redmine.url, 'project', journals=True)
+        executor = ThreadPoolExecutor(max_workers=2)
+        page = source.withJournals(source.fetchPage(0), executor)
+        executor.shutdown()
+        self.assertFalse(b'<?xml' in page)
+        self.assertEqual(len(fromstring(page).findall('issue/journals/journal')), 200)
+
+        fetched = RedmineIssueXML()
+        exported = RedmineIssueXML()
+        with contextlib.redirect_stdout(io.StringIO()):
+            fetched.readRedmine(source, [5, 6], {1: 'user'})
+            exported.readXML(self.export, [5, 6], {1: 'user'}, streaming=True)
+        self.assertEqual(issueFields(fetched), issueFields(exported))
+        self.assertTrue([issue for issue in fetched.githubIssues if issue.comments])
+
+if __name__ == '__main__':
+    unittest.main()